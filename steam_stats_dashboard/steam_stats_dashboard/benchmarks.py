@@ -0,0 +1,266 @@
+"""
+Benchmarks for the profile load and dashboard panel hot paths
+
+Profiles are synthetic (see steam_api/fake_server.py) and served by an in-process fake
+Steam API with no added latency, so cold-cache timings measure our own overhead (request
+handling, parsing, caching) rather than Steam's response times. A local memory cache
+is used for the duration of the run.
+
+Library cases run once per library size, with no friends. Friend cases run once per
+friend count, with a fixed library size (FRIEND_CASE_NUM_GAMES).
+
+Run with: python manage.py benchmark (see management/commands/benchmark.py)
+"""
+from datetime import datetime
+import gc
+import platform
+import statistics
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test.utils import override_settings
+
+from .helpers.panel_data import PanelDataTimePlayed, PanelDataCollection
+from .helpers.time_calc import TimeCalc
+from .steam_api.game_catalog import GameCatalog
+from .steam_api.fake_server import FakeSteamAPIServer, FakeSteamData, STEAM_ID_BASE
+from .steam_api.steam_api import SteamAPI
+from .steam_api.steam_user_profile import SteamUserProfile
+
+LIBRARY_SIZES = (10, 100, 1000, 10000, 50000)
+FRIEND_COUNTS = (0, 200, 2000)
+FRIEND_CASE_NUM_GAMES = 100
+
+BENCHMARK_SETTINGS = {
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'steam-stats-benchmark',
+            'TIMEOUT': None,
+            'OPTIONS': {'MAX_ENTRIES': 1000000},
+        }
+    },
+    # Don't let the API key budget throttle the fake server
+    'STEAM_API_RATE_LIMITS': {'default': (1000000, 1000000)},
+    'STEAM_API_DAILY_QUOTA': 10 ** 12,
+}
+
+def time_call(func, repeat, setup=None):
+    """
+    Return list of ms taken by each of repeat calls to func
+    @param setup: optional callable run before each call, not timed. Its return value
+    is passed to func.
+    """
+    samples = []
+
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        gc.collect()
+        start = time.perf_counter()
+        func(arg) if setup else func()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return samples
+
+def peak_memory_kb(func):
+    """ Return peak memory allocated in KB while calling func once """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+def result(case, num_games, num_friends, samples, peak_kb=None):
+    """ Return result dict for a benchmark case """
+    return {
+        'case': case,
+        'games': num_games,
+        'friends': num_friends,
+        'median_ms': round(statistics.median(samples), 3),
+        'min_ms': round(min(samples), 3),
+        'max_ms': round(max(samples), 3),
+        'peak_kb': round(peak_kb, 1) if peak_kb is not None else None,
+    }
+
+def result_key(case_result):
+    return (case_result['case'], case_result['games'], case_result['friends'])
+
+class BenchmarkRunner:
+    """ Runs benchmark cases against synthetic profiles and collects results """
+
+    def __init__(self, library_sizes=LIBRARY_SIZES, friend_counts=FRIEND_COUNTS, repeat=5, log=None):
+        self.library_sizes = library_sizes
+        self.friend_counts = friend_counts
+        self.repeat = repeat
+        self.log = log or (lambda message: None)
+        self._next_steam_id = STEAM_ID_BASE + 1
+
+    def _new_steam_id(self):
+        """ Return an unused steam_id, so cold loads can't hit data cached by earlier cases """
+        self._next_steam_id += 1
+        return str(self._next_steam_id)
+
+    def run(self):
+        """ Run all cases and return results dict """
+        results = []
+
+        with override_settings(**BENCHMARK_SETTINGS):
+            results.append(self._bench_time_calc())
+
+            for num_games in self.library_sizes:
+                self.log("Library cases: {} games".format(num_games))
+                results.extend(self._bench_library(num_games))
+
+            for num_friends in self.friend_counts:
+                self.log("Friend cases: {} friends".format(num_friends))
+                results.extend(self._bench_friends(num_friends))
+
+        return {
+            'meta': {
+                'timestamp': datetime.utcnow().isoformat(),
+                'python': platform.python_version(),
+                'repeat': self.repeat,
+            },
+            'results': results,
+        }
+
+    def _with_server(self, data, func):
+        """ Call func with a fake Steam API serving data, and SteamAPI pointed at it """
+        server = FakeSteamAPIServer(port=0, data=data)
+        server.start()
+        base_url, SteamAPI.BASE_URL = SteamAPI.BASE_URL, server.base_url
+        try:
+            return func()
+        finally:
+            SteamAPI.BASE_URL = base_url
+            server.stop()
+
+    def _bench_time_calc(self):
+        calls = 10000
+        samples = time_call(lambda: [TimeCalc.mins_to_time_dict(mins) for mins in range(0, calls * 53, 53)],
+                            self.repeat)
+        return result('time_calc.mins_to_time_dict_x{}'.format(calls), 0, 0, samples)
+
+    def _bench_library(self, num_games):
+        data = FakeSteamData(num_games=num_games, num_friends=0, private_ratio=0)
+        return self._with_server(data, lambda: self._library_cases(num_games))
+
+    def _library_cases(self, num_games):
+        results = []
+
+        def cold_load():
+            cache.clear()
+            GameCatalog.clear_local()
+            return SteamUserProfile(self._new_steam_id())
+
+        results.append(result('load_player_data.cold', num_games, 0, time_call(cold_load, self.repeat),
+                              peak_memory_kb(cold_load)))
+
+        steam_id = self._new_steam_id()
+        profile = SteamUserProfile(steam_id)
+        warm_load = lambda: SteamUserProfile(steam_id)
+        results.append(result('load_player_data.warm', num_games, 0, time_call(warm_load, self.repeat),
+                              peak_memory_kb(warm_load)))
+
+        games_json = profile.get_games_owned_json()
+        recently_played_json = profile.get_recently_played_json()
+        load_games = lambda: profile.load_games_owned(games_json)
+        results.append(result('load_games_owned', num_games, 0, time_call(load_games, self.repeat),
+                              peak_memory_kb(load_games)))
+
+        # Panels run on a freshly built library each time, so memoized stats aren't reused
+        def fresh_profile():
+            profile.load_games_owned(games_json)
+            profile.load_recently_played(recently_played_json)
+            return profile
+
+        results.append(result('panel.time_played', num_games, 0,
+                              time_call(self._time_played_context, self.repeat, setup=fresh_profile)))
+        results.append(result('panel.collection', num_games, 0,
+                              time_call(self._collection_context, self.repeat, setup=fresh_profile)))
+
+        def render_panels(profile):
+            render_to_string('panels/time-played.html', self._time_played_context(profile))
+            render_to_string('panels/collection.html', self._collection_context(profile))
+
+        results.append(result('render.panels', num_games, 0,
+                              time_call(render_panels, self.repeat, setup=fresh_profile)))
+
+        return results
+
+    @staticmethod
+    def _time_played_context(profile):
+        panel_data = PanelDataTimePlayed(profile)
+        return {
+            'time_played': {
+                'lifetime_hours': panel_data.time_played_hours_total(),
+                'lifetime_time_dict': panel_data.time_played_dict_total(),
+                'lifetime_daily_avg': panel_data.avg_daily_hours_total(),
+                'lifetime_daily_avg_dict': panel_data.avg_daily_time_dict_total(),
+                'two_weeks_time_dict': panel_data.time_played_two_weeks_dict(),
+                'two_weeks_daily_avg_dict': panel_data.avg_daily_time_dict_two_weeks(),
+            }
+        }
+
+    @staticmethod
+    def _collection_context(profile):
+        panel_data = PanelDataCollection(profile)
+        games_played, games_unplayed = panel_data.played_and_unplayed_lists(played_mins_threshold=30)
+        return {
+            'collection': {
+                'top_played_games': panel_data.with_current_players(panel_data.top_played_games(num_games=3)),
+                'games_played': games_played,
+                'games_unplayed': games_unplayed,
+                'games_played_percent': panel_data.played_percent(played_mins_threshold=30),
+            }
+        }
+
+    def _bench_friends(self, num_friends):
+        data = FakeSteamData(num_games=FRIEND_CASE_NUM_GAMES, num_friends=num_friends, private_ratio=0)
+        return self._with_server(data, lambda: self._friend_cases(num_friends))
+
+    def _friend_cases(self, num_friends):
+        results = []
+
+        def cold_load():
+            cache.clear()
+            GameCatalog.clear_local()
+            profile = SteamUserProfile(self._new_steam_id(), load_friends=True)
+            profile.friend_list.prefetch()
+            return profile
+
+        results.append(result('friend_list.load_all.cold', FRIEND_CASE_NUM_GAMES, num_friends,
+                              time_call(cold_load, self.repeat), peak_memory_kb(cold_load)))
+
+        steam_id = self._new_steam_id()
+        SteamUserProfile(steam_id, load_friends=True).friend_list.prefetch()
+
+        def warm_load():
+            profile = SteamUserProfile(steam_id, load_friends=True)
+            profile.friend_list.prefetch()
+            return profile
+
+        results.append(result('friend_list.load_all.warm', FRIEND_CASE_NUM_GAMES, num_friends,
+                              time_call(warm_load, self.repeat), peak_memory_kb(warm_load)))
+
+        return results
+
+def compare(results, baseline):
+    """
+    Return list of (result, baseline result, percent change in median) for results
+    with a matching case in baseline
+    """
+    baseline_results = {result_key(case_result): case_result for case_result in baseline['results']}
+    comparisons = []
+
+    for case_result in results['results']:
+        baseline_result = baseline_results.get(result_key(case_result))
+        if baseline_result and baseline_result['median_ms']:
+            change = (case_result['median_ms'] - baseline_result['median_ms']) / baseline_result['median_ms'] * 100
+            comparisons.append((case_result, baseline_result, round(change, 1)))
+
+    return comparisons
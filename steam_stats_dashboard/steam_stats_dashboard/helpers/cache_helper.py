@@ -2,9 +2,13 @@
 Helper module for building cache keys
 """
 
+# Bump when the shape of cached values changes, so old entries are ignored
+CACHE_SCHEMA_VERSION = 4
+
 class CacheKey:
     USER = 'user'
     GAME = 'game'
+    STEAM_API = 'steam_api'
 
 def build_key(object_name, identifier, object_value_name):
     """
@@ -16,3 +20,12 @@ def build_key(object_name, identifier, object_value_name):
     Example result: "user:123:friend_list"
     """
     return ":".join([object_name, str(identifier), object_value_name])
+
+def build_versioned_key(object_name, identifier, object_value_name, version=CACHE_SCHEMA_VERSION):
+    """
+    Returns cache key name from provided params, suffixed with cache schema version
+    @param version: schema version of the stored value
+
+    Example result: "user:123:profile_data:v3"
+    """
+    return ":".join([build_key(object_name, identifier, object_value_name), "v{}".format(version)])
@@ -0,0 +1,58 @@
+"""
+Helper module for caching rendered dashboard panel fragments
+
+Fragments are keyed by steam_id, panel name, and the version of the profile data
+they were rendered from (ProfileCache.data_version), so a fragment is reused until
+the underlying Steam data changes.
+
+The latest fragment rendered for each panel is also kept, regardless of version. If the
+panel's data can't be loaded because Steam is rate limited or unreachable, it's shown
+instead (or an unavailable panel, if there's none), rather than failing the dashboard.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from .cache_helper import CacheKey, build_versioned_key
+from .instrumentation import Instrumentation
+from ..steam_api.steam_api import SteamAPIConnectionError, SteamAPIRateLimited
+
+logger = logging.getLogger(__name__)
+
+def render_panel(request, steam_id, panel_name, data_version, context_func):
+    """
+    Return rendered html for the dashboard panel template panels/<panel_name>.html
+    @param steam_id: id of the player the panel is for
+    @param panel_name: name of the panel template
+    @param data_version: version of the player's data, or None to render without caching
+    @param context_func: callable returning the panel's template context, only called
+    if the fragment isn't cached
+    """
+    cache_key = build_versioned_key(CacheKey.USER, steam_id, "fragment:{}:{}".format(panel_name, data_version))
+
+    if data_version:
+        fragment = cache.get(cache_key)
+        if fragment is not None:
+            return fragment
+
+    fallback_key = build_versioned_key(CacheKey.USER, steam_id, "fragment:{}:latest".format(panel_name))
+
+    try:
+        with Instrumentation.aggregation(panel_name):
+            context = context_func()
+    except (SteamAPIRateLimited, SteamAPIConnectionError):
+        logger.warning("Steam unavailable rendering %s panel for %s, showing latest fragment", panel_name, steam_id)
+        fragment = cache.get(fallback_key)
+        if fragment is None:
+            fragment = render_to_string("panels/unavailable.html", {'panel_name': panel_name}, request=request)
+        return fragment
+
+    fragment = render_to_string("panels/{}.html".format(panel_name), context, request=request)
+
+    if data_version:
+        cache.set(cache_key, fragment, settings.DASHBOARD_FRAGMENT_TIMEOUT)
+    cache.set(fallback_key, fragment, settings.DASHBOARD_FRAGMENT_FALLBACK_TIMEOUT)
+
+    return fragment
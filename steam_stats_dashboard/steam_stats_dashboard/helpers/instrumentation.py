@@ -0,0 +1,208 @@
+"""
+Helper module for hot path instrumentation
+
+Steam API calls, profile cache lookups, and panel aggregation record into:
+- the current request's RequestMetrics (thread-local, started by ServerTimingMiddleware),
+  reported in the response's Server-Timing header
+- process-wide histograms and counters, exposed for scraping in Prometheus text format
+  by the metrics view
+
+Work handed to worker threads during a request should be wrapped with
+Instrumentation.bind, so it records into the request that started it.
+"""
+from collections import Counter
+from contextlib import contextmanager
+import threading
+import time
+
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class Histogram:
+    ''' Cumulative bucket histogram of observed values '''
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS_MS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        for index, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+class RequestMetrics:
+    ''' Totals for a single request '''
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.upstream_calls = 0
+        self.upstream_ms = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.aggregation_ms = 0
+        self._lock = threading.Lock() # worker threads may record into the same request
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def add(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def server_timing(self):
+        ''' Return Server-Timing header value for the request '''
+        return ", ".join([
+            'steam;dur={:.1f};desc="Steam API calls: {}"'.format(self.upstream_ms, self.upstream_calls),
+            'cache;desc="Cache hits: {}, misses: {}"'.format(self.cache_hits, self.cache_misses),
+            'agg;dur={:.1f};desc="Aggregation"'.format(self.aggregation_ms),
+            'total;dur={:.1f}'.format(self.total_ms),
+        ])
+
+class Instrumentation:
+    ''' Recording hooks for per-request totals and process-wide metrics '''
+
+    _local = threading.local()
+    _lock = threading.Lock()
+    _histograms = {}
+    _counters = Counter()
+
+    ########## Request scope ##########
+
+    @classmethod
+    def start_request(cls):
+        cls._local.request = RequestMetrics()
+        return cls._local.request
+
+    @classmethod
+    def end_request(cls):
+        ''' Stop recording for the current request, and record its totals process-wide '''
+        request_metrics = cls.current_request()
+        cls._local.request = None
+
+        if request_metrics:
+            cls.observe('request_ms', request_metrics.total_ms)
+            cls.observe('request_upstream_ms', request_metrics.upstream_ms)
+
+        return request_metrics
+
+    @classmethod
+    def current_request(cls):
+        return getattr(cls._local, 'request', None)
+
+    @classmethod
+    def bind(cls, func):
+        ''' Return func wrapped to record into the current request when called from another thread '''
+        request_metrics = cls.current_request()
+
+        def bound(*args, **kwargs):
+            previous = cls.current_request()
+            cls._local.request = request_metrics
+            try:
+                return func(*args, **kwargs)
+            finally:
+                cls._local.request = previous
+
+        return bound
+
+    ########## Process-wide metrics ##########
+
+    @classmethod
+    def observe(cls, name, value, **labels):
+        ''' Add value to the histogram for name and labels '''
+        key = (name, tuple(sorted(labels.items())))
+        with cls._lock:
+            if key not in cls._histograms:
+                cls._histograms[key] = Histogram()
+            cls._histograms[key].observe(value)
+
+    @classmethod
+    def increment(cls, name, amount=1, **labels):
+        with cls._lock:
+            cls._counters[(name, tuple(sorted(labels.items())))] += amount
+
+    ########## Hooks ##########
+
+    @classmethod
+    def record_upstream_call(cls, interface, method, duration_ms, status):
+        ''' Record a Steam API call '''
+        cls.observe('steam_api_call_ms', duration_ms, interface=interface, method=method)
+        cls.increment('steam_api_calls', interface=interface, method=method, status=status)
+
+        request_metrics = cls.current_request()
+        if request_metrics:
+            request_metrics.add(upstream_calls=1, upstream_ms=duration_ms)
+
+    @classmethod
+    def record_cache_lookup(cls, value_name, hits=0, misses=0):
+        ''' Record profile cache hits and misses for a cached value (e.g. 'games_owned') '''
+        if hits:
+            cls.increment('profile_cache_hits', hits, value=value_name)
+        if misses:
+            cls.increment('profile_cache_misses', misses, value=value_name)
+
+        request_metrics = cls.current_request()
+        if request_metrics:
+            request_metrics.add(cache_hits=hits, cache_misses=misses)
+
+    @classmethod
+    @contextmanager
+    def aggregation(cls, name):
+        ''' Context manager timing a panel aggregation step '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            cls.observe('aggregation_ms', duration_ms, step=name)
+
+            request_metrics = cls.current_request()
+            if request_metrics:
+                request_metrics.add(aggregation_ms=duration_ms)
+
+    ########## Export ##########
+
+    @staticmethod
+    def _format_labels(labels):
+        if not labels:
+            return ""
+        return "{" + ",".join('{}="{}"'.format(name, value) for name, value in labels) + "}"
+
+    @classmethod
+    def render_prometheus(cls, extra_gauges=None):
+        ''' Return process-wide metrics in Prometheus text exposition format
+            @param dict extra_gauges: additional gauge values by metric name
+        '''
+        lines = []
+
+        with cls._lock:
+            histograms = sorted(cls._histograms.items())
+            counters = sorted(cls._counters.items())
+
+        typed = set()
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                lines.append("# TYPE {} histogram".format(name))
+                typed.add(name)
+            for upper_bound, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+                lines.append("{}_bucket{} {}".format(name, cls._format_labels(labels + (('le', upper_bound),)),
+                                                     bucket_count))
+            lines.append("{}_bucket{} {}".format(name, cls._format_labels(labels + (('le', '+Inf'),)), histogram.count))
+            lines.append("{}_sum{} {}".format(name, cls._format_labels(labels), round(histogram.sum, 3)))
+            lines.append("{}_count{} {}".format(name, cls._format_labels(labels), histogram.count))
+
+        for (name, labels), count in counters:
+            if name not in typed:
+                lines.append("# TYPE {}_total counter".format(name))
+                typed.add(name)
+            lines.append("{}_total{} {}".format(name, cls._format_labels(labels), count))
+
+        for name, value in sorted((extra_gauges or {}).items()):
+            lines.append("# TYPE {} gauge".format(name))
+            lines.append("{} {}".format(name, value))
+
+        return "\n".join(lines) + "\n"
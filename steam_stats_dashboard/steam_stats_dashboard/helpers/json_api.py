@@ -0,0 +1,202 @@
+"""
+Helper module for the player JSON API (see views.api_library, api_stats, api_friends)
+
+Library and friend records are returned a page at a time, with an opaque cursor to the
+next page. A cursor holds the offset of the next record and the version of the cached
+data it was issued for (ProfileCache.data_version), so paging across a refresh of the
+player's data is rejected instead of silently skipping or repeating records.
+
+With format=ndjson, every record from the cursor on is streamed as newline-delimited
+JSON. Records are serialized from a generator in chunks of API_STREAM_CHUNK_SIZE, so the
+response is never built in memory as a whole, and the first chunk is sent as soon as
+it's ready. Friend profiles are loaded a page at a time as the stream reaches them.
+
+Clients can select the fields returned with a comma separated fields parameter.
+"""
+import base64
+import binascii
+from itertools import islice
+import logging
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from ..steam_api.steam_api import SteamAPIError
+
+logger = logging.getLogger(__name__)
+
+LIBRARY_FIELDS = (
+    'app_id',
+    'name',
+    'playtime_mins',
+    'playtime_mins_two_weeks',
+    'icon_img',
+    'logo_img',
+)
+
+FRIEND_FIELDS = (
+    'steam_id',
+    'public',
+    'persona_name',
+    'profile_url',
+    'avatar',
+    'avatar_medium',
+    'avatar_full',
+    'time_joined',
+)
+
+STATS_FIELDS = (
+    'num_games',
+    'played_count',
+    'played_percent',
+    'total_playtime_mins',
+    'median_playtime_mins',
+    'two_week_playtime_mins',
+)
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+class APIRequestError(Exception):
+    ''' Invalid API request parameters
+        @param int status: HTTP status code to respond with
+    '''
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def parse_fields(value, allowed_fields):
+    """
+    Return tuple of the fields selected by a comma separated fields parameter, in the
+    order given, or all allowed_fields if not set
+    @raises APIRequestError if a field isn't in allowed_fields
+    """
+    if not value:
+        return allowed_fields
+
+    fields = tuple(field.strip() for field in value.split(',') if field.strip())
+    unknown = [field for field in fields if field not in allowed_fields]
+    if unknown or not fields:
+        raise APIRequestError("Unknown fields: {}. Allowed fields: {}".format(
+            ", ".join(unknown), ", ".join(allowed_fields)))
+
+    return fields
+
+def parse_limit(value):
+    """
+    Return page size from a limit parameter, API_PAGE_SIZE if not set
+    @raises APIRequestError if not an int from 1 to API_MAX_PAGE_SIZE
+    """
+    if not value:
+        return settings.API_PAGE_SIZE
+
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+
+    if not 1 <= limit <= settings.API_MAX_PAGE_SIZE:
+        raise APIRequestError("limit must be from 1 to {}".format(settings.API_MAX_PAGE_SIZE))
+
+    return limit
+
+def encode_cursor(offset, data_version):
+    """ Return opaque cursor for the record at offset in data of data_version """
+    return base64.urlsafe_b64encode("{}:{}".format(offset, data_version or '').encode('ascii')).decode('ascii')
+
+def decode_cursor(cursor, data_version):
+    """
+    Return offset from a cursor issued by encode_cursor, 0 if cursor isn't set
+    @raises APIRequestError if the cursor is invalid, or was issued for another version
+    of the data (409, the client should start over)
+    """
+    if not cursor:
+        return 0
+
+    try:
+        offset, cursor_version = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii').split(':')
+        offset = int(offset)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise APIRequestError("Invalid cursor")
+
+    if offset < 0:
+        raise APIRequestError("Invalid cursor")
+    if cursor_version != (data_version or ''):
+        raise APIRequestError("Data has changed since the cursor was issued, start over without a cursor", 409)
+
+    return offset
+
+def select(record, fields):
+    """ Return dict of the selected fields of a record dict """
+    return {field: record[field] for field in fields}
+
+def game_record(game, fields):
+    """ Return dict of the selected LIBRARY_FIELDS of a game (Game or GameView) """
+    return {field: getattr(game, field) for field in fields}
+
+def library_records(library, fields, start=0, stop=None):
+    """ Yield records for the games in library from index start up to stop """
+    stop = len(library) if stop is None else min(stop, len(library))
+    for index in range(start, stop):
+        yield game_record(library[index], fields)
+
+def friend_records(friend_list, fields, start=0, stop=None):
+    """
+    Yield records for the friends in friend_list from index start up to stop, loading
+    one page of friend profiles (STEAM_FRIEND_PAGE_SIZE) at a time. If a page can't be
+    loaded from Steam, its friends are loaded with empty profiles (as FriendList.prefetch
+    does if rate limited), since a streamed response has already started and can't fail.
+    """
+    stop = len(friend_list) if stop is None else min(stop, len(friend_list))
+    page_size = settings.STEAM_FRIEND_PAGE_SIZE
+
+    for page_start in range(start, stop, page_size):
+        page_stop = min(page_start + page_size, stop)
+        try:
+            friends = friend_list.prefetch(page_start, page_stop - page_start)
+        except SteamAPIError as error:
+            logger.warning("Friend profiles not loaded for %s: %s", friend_list.steam_id, error)
+            friends = [friend_list[index] for index in range(page_start, page_stop)]
+            for friend in friends:
+                if not friend.is_loaded:
+                    friend.load(None)
+
+        for friend in friends:
+            yield select(friend.profile.profile_dict, fields)
+
+def stats_record(library, recently_played, fields):
+    """ Return dict of the selected STATS_FIELDS for a library and its recently played games """
+    stats = library.stats
+    computed = {
+        'num_games': lambda: stats.num_games,
+        'played_count': stats.played_count,
+        'played_percent': stats.played_percent,
+        'total_playtime_mins': lambda: stats.total_playtime_mins,
+        'median_playtime_mins': lambda: stats.playtime_percentile(50),
+        'two_week_playtime_mins': lambda: recently_played.stats.two_week_playtime_mins,
+    }
+    return {field: computed[field]() for field in fields}
+
+def page(records, total, offset, limit, data_version, key):
+    """
+    Return response dict for a page of up to limit records from offset
+    @param records: iterable of records from offset on (only limit are consumed)
+    @param str key: name of the records list in the response
+    """
+    next_offset = offset + limit
+    return {
+        key: list(islice(records, limit)),
+        'total': total,
+        'next_cursor': encode_cursor(next_offset, data_version) if next_offset < total else None,
+    }
+
+def ndjson_stream(records):
+    """ Yield newline-delimited JSON for records, API_STREAM_CHUNK_SIZE records at a time """
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    records = iter(records)
+
+    while True:
+        chunk = [encoder.encode(record) for record in islice(records, settings.API_STREAM_CHUNK_SIZE)]
+        if not chunk:
+            break
+        yield "\n".join(chunk) + "\n"
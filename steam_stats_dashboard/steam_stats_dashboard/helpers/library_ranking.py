@@ -0,0 +1,53 @@
+"""
+Helper module for ranking games in a GameLibrary by playtime
+
+Top-N queries use heap selection (O(n log k)) over the library's playtime arrays.
+A full sorted index is only built when a rank lookup needs it, and is then reused
+for later top-N queries on the same library (see GameLibrary.ranking).
+"""
+import heapq
+
+class LibraryRanking:
+    ''' Top-N and rank lookups by total or two week playtime for a GameLibrary '''
+
+    def __init__(self, library):
+        ''' @param GameLibrary library: library to rank. Must not change afterwards. '''
+        self.library = library
+        self._sorted_indexes = {}
+        self._ranks = {}
+
+    def _playtimes(self, two_weeks):
+        return self.library.playtime_mins_two_weeks if two_weeks else self.library.playtime_mins
+
+    def sorted_indexes(self, two_weeks=False):
+        ''' Return list of library indexes ordered highest to lowest by playtime.
+            Games with equal playtime keep library order.
+        '''
+        if two_weeks not in self._sorted_indexes:
+            playtimes = self._playtimes(two_weeks)
+            self._sorted_indexes[two_weeks] = sorted(range(len(self.library)), key=playtimes.__getitem__, reverse=True)
+
+        return self._sorted_indexes[two_weeks]
+
+    def top_indexes(self, num_games, two_weeks=False):
+        ''' Return library indexes of the num_games most played games, highest first '''
+        if two_weeks in self._sorted_indexes:
+            return self._sorted_indexes[two_weeks][:num_games]
+
+        playtimes = self._playtimes(two_weeks)
+        return heapq.nlargest(num_games, range(len(self.library)), key=playtimes.__getitem__)
+
+    def top_games(self, num_games, two_weeks=False):
+        ''' Return list of the num_games most played games, highest first
+            @param bool two_weeks: rank by playtime over the past two weeks instead of total playtime
+        '''
+        return [self.library[index] for index in self.top_indexes(num_games, two_weeks)]
+
+    def rank(self, app_id, two_weeks=False):
+        ''' Return 1-based playtime rank of app_id in the library, or None if not owned '''
+        if two_weeks not in self._ranks:
+            app_ids = self.library.app_ids
+            self._ranks[two_weeks] = {app_ids[index]: rank
+                                      for rank, index in enumerate(self.sorted_indexes(two_weeks), start=1)}
+
+        return self._ranks[two_weeks].get(app_id)
@@ -0,0 +1,63 @@
+"""
+Helper module to aggregate playtime metrics over a GameLibrary
+
+LibraryStats is built once per library (see GameLibrary.stats) and shared by the
+dashboard panels, so each metric is a reduction over the library's playtime arrays
+instead of a walk over every game per metric.
+"""
+from array import array
+from bisect import bisect_left
+import math
+
+class LibraryStats:
+    ''' Playtime totals, partitions, and percentiles for a GameLibrary '''
+
+    def __init__(self, library):
+        ''' @param GameLibrary library: library to aggregate. Must not change afterwards. '''
+        self.library = library
+        self.total_playtime_mins = sum(library.playtime_mins)
+        self.two_week_playtime_mins = sum(library.playtime_mins_two_weeks)
+
+        # Playtimes in ascending order, for threshold counts and percentiles
+        self._sorted_playtime_mins = array('l', sorted(library.playtime_mins))
+        self._partitions = {}
+
+    @property
+    def num_games(self):
+        return len(self.library)
+
+    def played_count(self, played_mins_threshold=1):
+        ''' Return number of games played for at least played_mins_threshold minutes '''
+        return self.num_games - bisect_left(self._sorted_playtime_mins, played_mins_threshold)
+
+    def played_and_unplayed_indexes(self, played_mins_threshold=1):
+        ''' Return tuple of (played, unplayed) lists of library indexes, in library order
+            @param int played_mins_threshold: min number of minutes to classify a game as 'played'
+        '''
+        if played_mins_threshold not in self._partitions:
+            played, unplayed = [], []
+            for index, playtime_mins in enumerate(self.library.playtime_mins):
+                (played if playtime_mins >= played_mins_threshold else unplayed).append(index)
+            self._partitions[played_mins_threshold] = (played, unplayed)
+
+        return self._partitions[played_mins_threshold]
+
+    def played_and_unplayed(self, played_mins_threshold=1):
+        ''' Return tuple of (played, unplayed) lists of games, in library order '''
+        played, unplayed = self.played_and_unplayed_indexes(played_mins_threshold)
+        return ([self.library[index] for index in played], [self.library[index] for index in unplayed])
+
+    def played_percent(self, played_mins_threshold=1):
+        ''' Return percent of library played for at least played_mins_threshold minutes, or 0 if empty '''
+        if not self.num_games:
+            return 0
+        return round(self.played_count(played_mins_threshold) / self.num_games * 100)
+
+    def playtime_percentile(self, percent):
+        ''' Return playtime in mins at the given percentile of the library (nearest rank), or 0 if empty
+            @param float percent: percentile, 0-100
+        '''
+        if not self.num_games:
+            return 0
+        rank = max(math.ceil(percent / 100 * self.num_games), 1)
+        return self._sorted_playtime_mins[min(rank, self.num_games) - 1]
@@ -1,7 +1,11 @@
 """
 Helper module to process and generate data to be displayed in dashboard panels
 """
+from .playtime_history import PlaytimeHistory
 from .time_calc import TimeCalc
+from ..steam_api.achievements import AchievementPipeline, PROGRESS_FIELDS
+from ..steam_api.app_stats import AppStats
+from ..steam_api.profile_cache import ProfileCache, unpack
 
 class PanelDataTimePlayed:
     ''' Helper class for getting time stats dashboard panel data for provided user profile '''
@@ -12,12 +16,12 @@ class PanelDataTimePlayed:
     # Get time played in mins (used for other calculations)
 
     def _total_playtime_mins(self):
-        ''' Sum and return total playtime across all games for the player '''
-        return sum(int(game.playtime_mins) for game in self.profile.games_owned)
+        ''' Return total playtime across all games for the player '''
+        return self.profile.games_owned.stats.total_playtime_mins
 
     def _two_week_playtime_mins(self):
         ''' Return player's total minutes played from the last two weeks '''
-        return sum([int(game.playtime_mins_two_weeks) for game in self.profile.games_owned if game.playtime_mins_two_weeks])
+        return self.profile.recently_played.stats.two_week_playtime_mins
 
     # Lifetime
 
@@ -57,6 +61,14 @@ class PanelDataTimePlayed:
                                                      TimeCalc.two_weeks_ago_time)
         return TimeCalc.mins_to_time_dict(avg_mins_per_day)
 
+    # Stored playtime history
+
+    def time_played_dict_last_days(self, days=30):
+        ''' Return time dict of mins played over the given number of days, from stored
+            playtime snapshots (see playtime_history.py)
+        '''
+        return TimeCalc.mins_to_time_dict(PlaytimeHistory.playtime_mins_last_days(self.profile.steam_id, days))
+
 class PanelDataCollection:
     ''' Helper class for getting game collection panel data for provided user profile '''
 
@@ -64,24 +76,63 @@ class PanelDataCollection:
         self.profile = profile
 
     def top_played_games(self, num_games=5):
-        ''' Sort self.games_owned by number of mins played (desc) and return requested number of games
+        ''' Return requested number of games with the most mins played
             @param int num_games: number of games to return
             @return list of game objects, ordered highest to lowest by number of minutes played
         '''
-        self.profile.games_owned.sort(key=lambda x: x.playtime_mins, reverse=True)
-        return self.profile.games_owned[:num_games]
+        return self.profile.games_owned.ranking.top_games(num_games)
+
+    def top_played_games_two_weeks(self, num_games=5):
+        ''' Return requested number of games with the most mins played over the past two weeks
+            @param int num_games: number of games to return
+        '''
+        return self.profile.recently_played.ranking.top_games(num_games, two_weeks=True)
+
+    def with_current_players(self, games):
+        ''' Return list of (game, current player count) tuples for games. Counts come from the
+            shared app stats store (see app_stats.py), and are None for apps not refreshed yet.
+        '''
+        stats_by_id = AppStats.get_many([game.app_id for game in games])
+        return [(game, stats_by_id.get(game.app_id, {}).get('current_players')) for game in games]
 
     def played_and_unplayed_lists(self, played_mins_threshold=1):
         ''' Return tuple containing lists of user's played and unplayed games
             @param int played_mins_threshold: min number of minutes to classify a game as 'played'
         '''
-        games_played = []
-        games_unplayed = []
+        return self.profile.games_owned.stats.played_and_unplayed(played_mins_threshold)
+
+    def played_percent(self, played_mins_threshold=1):
+        ''' Return percent of user's games played for at least played_mins_threshold minutes '''
+        return self.profile.games_owned.stats.played_percent(played_mins_threshold)
 
-        for game in self.profile.games_owned:
-            if game.playtime_mins >= played_mins_threshold:
-                games_played.append(game)
-            else:
-                games_unplayed.append(game)
+class PanelDataAchievements:
+    ''' Helper class for getting achievements panel data for provided user profile.
+        Totals cover the games loaded so far (see achievements.py).
+    '''
 
-        return (games_played, games_unplayed)
+    def __init__(self, profile):
+        self.profile = profile
+        progress = ProfileCache.get_achievement_progress(profile.steam_id) or {}
+        self.progress_rows = [unpack(row, PROGRESS_FIELDS) for row in progress.values()]
+
+    def completion(self):
+        ''' Return dict of achievements unlocked and total, percent unlocked, number of games
+            with every achievement unlocked, and global percentage of the rarest unlocked achievement
+        '''
+        unlocked = sum(row['unlocked'] for row in self.progress_rows)
+        total = sum(row['total'] for row in self.progress_rows)
+
+        return {
+            'unlocked': unlocked,
+            'total': total,
+            'percent': round(unlocked / total * 100, 1) if total else 0,
+            'perfect_games': sum(1 for row in self.progress_rows if row['total'] and row['unlocked'] == row['total']),
+            'rarest_percent': min((row['rarest_percent'] for row in self.progress_rows
+                                   if row['rarest_percent'] is not None), default=None),
+        }
+
+    def games_pending(self):
+        ''' Start loading achievements in the background for played games not yet loaded,
+            and return the number of games pending
+        '''
+        return AchievementPipeline.schedule(self.profile.steam_id, self.profile.games_owned)
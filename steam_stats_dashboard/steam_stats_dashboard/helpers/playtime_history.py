@@ -0,0 +1,135 @@
+"""
+Helper module for storing and querying playtime history
+
+Steam only reports lifetime and two week playtimes, so snapshots of each player's lifetime
+playtime per app are stored periodically (see management/commands/snapshot_playtime.py)
+to answer time range queries, e.g. mins played over the last 30 days, from the database.
+
+Snapshots only store the apps played since the previous snapshot, and apps it didn't have
+(e.g. bought since, or the library was private), and aren't stored at all if neither changed.
+A new app's lifetime playtime is stored as its baseline rather than counted as time played.
+Every STEAM_SNAPSHOT_BASELINE_INTERVAL snapshots, a baseline with every app's playtime is
+stored instead, so a player's latest playtimes are rebuilt from at most that many rows. Time range totals are summed from the indexed total_delta column;
+mins played are counted at the time of the snapshot that recorded them, so ranges are
+accurate to the snapshot interval.
+"""
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from ..models import PlaytimeSnapshot
+
+def pack_array(values):
+    """ Return bytes of values packed as unsigned ints """
+    return array('I', values).tobytes()
+
+def unpack_array(data):
+    """ Return array of unsigned ints from bytes packed by pack_array """
+    values = array('I')
+    values.frombytes(bytes(data))
+    return values
+
+class PlaytimeHistory:
+    ''' Stores and queries PlaytimeSnapshot rows '''
+
+    @staticmethod
+    def latest_playtimes(steam_id):
+        ''' Return tuple of (dict of playtime_forever by app_id, number of snapshots stored
+            since the latest baseline) for steam_id, rebuilt from stored snapshots.
+            @return ({}, None) if no snapshots have been stored for steam_id
+        '''
+        snapshots = PlaytimeSnapshot.objects.filter(steam_id=steam_id)
+        baseline = snapshots.filter(is_baseline=True).order_by('-taken_at').first()
+
+        if baseline is None:
+            return ({}, None)
+
+        playtimes = dict(zip(unpack_array(baseline.app_ids), unpack_array(baseline.playtimes)))
+        deltas = snapshots.filter(is_baseline=False, taken_at__gt=baseline.taken_at).order_by('taken_at')
+        num_deltas = 0
+
+        for snapshot in deltas.only('app_ids', 'playtimes'):
+            for app_id, mins in zip(unpack_array(snapshot.app_ids), unpack_array(snapshot.playtimes)):
+                playtimes[app_id] = playtimes.get(app_id, 0) + mins
+            num_deltas += 1
+
+        return (playtimes, num_deltas)
+
+    @staticmethod
+    def build_snapshot(steam_id, games_owned, previous_playtimes, snapshots_since_baseline, taken_at):
+        ''' Return unsaved PlaytimeSnapshot for games_owned, or None if there's nothing to store
+            @param list games_owned: owned game dicts (see ProfileCache.get_games_owned)
+            @param dict previous_playtimes: playtime_forever by app_id as of the previous snapshot
+            @param int snapshots_since_baseline: as returned by latest_playtimes, None if no snapshots
+        '''
+        playtimes = {game['appid']: game['playtime_forever'] or 0 for game in games_owned}
+        # Apps the previous snapshot didn't have start from their current playtime
+        new_apps = {app_id: mins for app_id, mins in playtimes.items() if app_id not in previous_playtimes}
+        # Playtime can go down (e.g. refunds), which isn't counted as time played
+        deltas = {app_id: mins - previous_playtimes[app_id] for app_id, mins in playtimes.items()
+                  if app_id in previous_playtimes and mins > previous_playtimes[app_id]}
+        total_delta = sum(deltas.values())
+
+        is_baseline = (snapshots_since_baseline is None or
+                       snapshots_since_baseline + 1 >= settings.STEAM_SNAPSHOT_BASELINE_INTERVAL)
+
+        if is_baseline:
+            values = playtimes
+        elif deltas or new_apps:
+            values = {**new_apps, **deltas}
+        else:
+            return None
+
+        app_ids = sorted(values)
+        return PlaytimeSnapshot(
+            steam_id=steam_id,
+            taken_at=taken_at,
+            is_baseline=is_baseline,
+            app_ids=pack_array(app_ids),
+            playtimes=pack_array(values[app_id] for app_id in app_ids),
+            total_delta=total_delta,
+        )
+
+    @classmethod
+    def take_snapshots(cls, games_owned_by_id):
+        ''' Store snapshots for players, with one bulk insert per STEAM_SNAPSHOT_BATCH_SIZE rows
+            @param iterable games_owned_by_id: (steam_id, list of owned game dicts) pairs
+            @return number of snapshots stored
+        '''
+        taken_at = timezone.now()
+        batch = []
+        num_stored = 0
+
+        for steam_id, games_owned in games_owned_by_id:
+            snapshot = cls.build_snapshot(steam_id, games_owned, *cls.latest_playtimes(steam_id), taken_at=taken_at)
+            if snapshot is not None:
+                batch.append(snapshot)
+
+            if len(batch) >= settings.STEAM_SNAPSHOT_BATCH_SIZE:
+                PlaytimeSnapshot.objects.bulk_create(batch)
+                num_stored += len(batch)
+                batch = []
+
+        if batch:
+            PlaytimeSnapshot.objects.bulk_create(batch)
+            num_stored += len(batch)
+
+        return num_stored
+
+    @staticmethod
+    def playtime_mins(steam_id, start, end=None):
+        ''' Return mins played by steam_id recorded in snapshots taken after start, up to end '''
+        snapshots = PlaytimeSnapshot.objects.filter(steam_id=steam_id, taken_at__gt=start)
+
+        if end is not None:
+            snapshots = snapshots.filter(taken_at__lte=end)
+
+        return snapshots.aggregate(total=Sum('total_delta'))['total'] or 0
+
+    @classmethod
+    def playtime_mins_last_days(cls, steam_id, days):
+        ''' Return mins played by steam_id over the given number of days '''
+        return cls.playtime_mins(steam_id, timezone.now() - timedelta(days=days))
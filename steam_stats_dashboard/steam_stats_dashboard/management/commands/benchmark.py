@@ -0,0 +1,50 @@
+"""
+Management command to run the profile load and panel benchmarks (see benchmarks.py)
+"""
+import json
+
+from django.core.management.base import BaseCommand
+
+from steam_stats_dashboard.benchmarks import BenchmarkRunner, LIBRARY_SIZES, FRIEND_COUNTS, compare
+
+def int_list(value):
+    return tuple(int(item) for item in value.split(',') if item)
+
+class Command(BaseCommand):
+    help = "Benchmark profile loading, panel computation, and rendering on synthetic profiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int_list, default=LIBRARY_SIZES,
+                            help="comma separated library sizes (default: %(default)s)")
+        parser.add_argument('--friends', type=int_list, default=FRIEND_COUNTS,
+                            help="comma separated friend counts (default: %(default)s)")
+        parser.add_argument('--repeat', type=int, default=5, help="runs per case; the median is reported")
+        parser.add_argument('--output', help="write results json to this file")
+        parser.add_argument('--compare', help="results json from an earlier run to compare against")
+
+    def handle(self, *args, **options):
+        runner = BenchmarkRunner(library_sizes=options['games'], friend_counts=options['friends'],
+                                 repeat=options['repeat'], log=self.stderr.write)
+        results = runner.run()
+
+        row_format = "{:<42} {:>7} {:>8} {:>12} {:>12} {:>12}"
+        self.stdout.write(row_format.format('case', 'games', 'friends', 'median_ms', 'min_ms', 'peak_kb'))
+        for case_result in results['results']:
+            self.stdout.write(row_format.format(case_result['case'], case_result['games'], case_result['friends'],
+                                                case_result['median_ms'], case_result['min_ms'],
+                                                case_result['peak_kb'] if case_result['peak_kb'] is not None else '-'))
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(results, output_file, indent=2)
+            self.stdout.write("Results written to {}".format(options['output']))
+
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+            self.stdout.write("\nChange in median vs {}".format(options['compare']))
+            for case_result, baseline_result, change in compare(results, baseline):
+                self.stdout.write("{:<42} {:>7} {:>8} {:>10}ms -> {:>10}ms {:>+8}%".format(
+                    case_result['case'], case_result['games'], case_result['friends'],
+                    baseline_result['median_ms'], case_result['median_ms'], change))
@@ -0,0 +1,48 @@
+"""
+Management command to run a local fake Steam Web API server (see steam_api/fake_server.py)
+"""
+from django.core.management.base import BaseCommand
+
+from steam_stats_dashboard.steam_api.fake_server import FakeSteamAPIServer, FakeSteamData, FixtureStore
+
+class Command(BaseCommand):
+    help = "Serve a fake Steam Web API for load tests and benchmarks. " \
+           "Point settings.STEAM_API_BASE_URL at it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8090)
+        parser.add_argument('--seed', type=int, default=0, help="seed for synthetic data")
+        parser.add_argument('--games', type=int, default=100, help="games owned per player")
+        parser.add_argument('--friends', type=int, default=50, help="friends per player")
+        parser.add_argument('--private-ratio', type=float, default=0.1, help="share of private profiles (0-1)")
+        parser.add_argument('--latency-ms', type=float, default=0, help="mean delay added to responses")
+        parser.add_argument('--jitter-ms', type=float, default=0, help="max random deviation from latency")
+        parser.add_argument('--error-rate', type=float, default=0, help="share of 500 responses (0-1)")
+        parser.add_argument('--throttle-rate', type=float, default=0, help="share of 429 responses (0-1)")
+        parser.add_argument('--fixtures', help="json file of recorded responses to replay")
+        parser.add_argument('--record-from', help="real Steam API base url to proxy and record unmatched "
+                                                  "requests from, into --fixtures")
+
+    def handle(self, *args, **options):
+        server = FakeSteamAPIServer(
+            host=options['host'],
+            port=options['port'],
+            data=FakeSteamData(seed=options['seed'], num_games=options['games'], num_friends=options['friends'],
+                               private_ratio=options['private_ratio']),
+            fixtures=FixtureStore(options['fixtures']),
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            error_rate=options['error_rate'],
+            throttle_rate=options['throttle_rate'],
+            record_from=options['record_from'],
+            verbose=options['verbosity'] > 1,
+        )
+
+        self.stdout.write("Fake Steam API serving at {}".format(server.base_url))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
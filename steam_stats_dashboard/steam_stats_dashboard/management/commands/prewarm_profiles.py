@@ -0,0 +1,68 @@
+"""
+Management command to pre-warm cached Steam data for recently active users, so returning
+users land on a warm cache instead of waiting on Steam (see ProfileCache.refresh).
+Run once (e.g. from cron), or as a long running worker with --loop.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from steam_stats_dashboard.models import SteamUser
+from steam_stats_dashboard.steam_api.profile_cache import ProfileCache
+from steam_stats_dashboard.steam_api.rate_limiter import RateLimiter
+from steam_stats_dashboard.steam_api.steam_api import SteamAPIError, SteamAPIRateLimited
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = "Refetch cached profile, games owned, and friends of recently active users before they go stale"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--active-days', type=int, default=settings.STEAM_PREWARM_ACTIVE_DAYS,
+                            help="pre-warm users seen within this many days (default: %(default)s)")
+        parser.add_argument('--workers', type=int, default=settings.STEAM_PREWARM_WORKERS,
+                            help="max users refreshed at once (default: %(default)s)")
+        parser.add_argument('--interval', type=int, default=settings.STEAM_PREWARM_INTERVAL,
+                            help="seconds between runs with --loop; data going stale sooner is refetched "
+                                 "(default: %(default)s)")
+        parser.add_argument('--loop', action='store_true', help="keep running every --interval seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.time()
+            self.run(options['active_days'], options['workers'], options['interval'])
+
+            if not options['loop']:
+                break
+            time.sleep(max(options['interval'] - (time.time() - start), 0))
+
+    def run(self, active_days, workers, interval):
+        ''' Refresh data of users seen within active_days, most recently seen first '''
+        steam_ids = list(SteamUser.objects.filter(last_seen__gte=timezone.now() - timedelta(days=active_days))
+                                          .order_by('-last_seen').values_list('steam_id', flat=True))
+        stop = threading.Event()
+
+        def refresh(steam_id):
+            if stop.is_set() or not RateLimiter.batch_quota_available():
+                stop.set()
+                return 0
+
+            try:
+                return len(ProfileCache.refresh(steam_id, within=interval))
+            except SteamAPIRateLimited:
+                stop.set()
+            except SteamAPIError:
+                logger.exception("Pre-warm failed for %s", steam_id)
+            return 0
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            num_refreshed = sum(executor.map(refresh, steam_ids))
+
+        self.stdout.write("Checked {} active users, {} entries refetched{}".format(
+            len(steam_ids), num_refreshed, " (stopped early, API quota reserved)" if stop.is_set() else ""))
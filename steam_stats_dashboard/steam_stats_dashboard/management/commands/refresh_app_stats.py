@@ -0,0 +1,69 @@
+"""
+Management command to refresh the global per-app stats store (see steam_api/app_stats.py).
+Schedule it (e.g. hourly from cron, or with --loop); dashboard panels only read the store.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from steam_stats_dashboard.models import SteamUser
+from steam_stats_dashboard.steam_api.app_stats import AppStats
+from steam_stats_dashboard.steam_api.rate_limiter import RateLimiter
+from steam_stats_dashboard.steam_api.steam_api import SteamAPIError, SteamAPIRateLimited
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = "Refresh current player counts and global stats of the apps owned by the most active users"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=settings.STEAM_APP_STATS_BATCH_SIZE,
+                            help="most owned apps to refresh (default: %(default)s)")
+        parser.add_argument('--active-days', type=int, default=settings.STEAM_PREWARM_ACTIVE_DAYS,
+                            help="count apps owned by users seen within this many days (default: %(default)s)")
+        parser.add_argument('--workers', type=int, default=settings.STEAM_APP_STATS_WORKERS,
+                            help="max apps refreshed at once (default: %(default)s)")
+        parser.add_argument('--interval', type=int, default=3600, help="seconds between runs with --loop")
+        parser.add_argument('--loop', action='store_true', help="keep running every --interval seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.time()
+            self.run(options['limit'], options['active_days'], options['workers'])
+
+            if not options['loop']:
+                break
+            time.sleep(max(options['interval'] - (time.time() - start), 0))
+
+    def run(self, limit, active_days, workers):
+        ''' Refresh the apps owned by the most users seen within active_days, most owned first '''
+        steam_ids = SteamUser.objects.filter(last_seen__gte=timezone.now() - timedelta(days=active_days)) \
+                                     .values_list('steam_id', flat=True).iterator()
+        app_ids = AppStats.most_owned(steam_ids, limit)
+        stop = threading.Event()
+
+        def refresh(app_id):
+            if stop.is_set() or not RateLimiter.batch_quota_available():
+                stop.set()
+                return 0
+
+            try:
+                AppStats.refresh(app_id)
+                return 1
+            except SteamAPIRateLimited:
+                stop.set()
+            except SteamAPIError:
+                logger.exception("App stats refresh failed for %s", app_id)
+            return 0
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            num_refreshed = sum(executor.map(refresh, app_ids))
+
+        self.stdout.write("Refreshed stats for {} of {} apps{}".format(
+            num_refreshed, len(app_ids), " (stopped early, API quota reserved)" if stop.is_set() else ""))
@@ -0,0 +1,38 @@
+"""
+Management command to store playtime snapshots for registered users (see helpers/playtime_history.py).
+Run periodically, e.g. hourly or daily from cron; time range queries are accurate to the interval.
+"""
+from django.core.management.base import BaseCommand
+
+from steam_stats_dashboard.helpers.playtime_history import PlaytimeHistory
+from steam_stats_dashboard.models import SteamUser
+from steam_stats_dashboard.steam_api.profile_cache import ProfileCache
+from steam_stats_dashboard.steam_api.steam_api import SteamAPIRateLimited
+
+class Command(BaseCommand):
+    help = "Store a playtime snapshot for each registered user with a public library"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--steam-id', action='append', dest='steam_ids',
+                            help="only snapshot this steam id (may be repeated)")
+
+    def handle(self, *args, **options):
+        steam_ids = options['steam_ids'] or SteamUser.objects.values_list('steam_id', flat=True).iterator()
+        num_stored = PlaytimeHistory.take_snapshots(self._games_owned(steam_ids))
+        self.stdout.write("Stored {} playtime snapshots".format(num_stored))
+
+    def _games_owned(self, steam_ids):
+        ''' Yield (steam_id, games owned) for players with a public library, until rate limited.
+            Games owned are requested from Steam rather than read from cache, so snapshots record
+            current playtimes; the results also refresh the cache. Empty libraries are skipped,
+            since private profiles get an empty reply, which isn't a baseline to count from.
+        '''
+        for steam_id in steam_ids:
+            try:
+                games_owned = ProfileCache.fetch_games_owned(steam_id)
+            except SteamAPIRateLimited:
+                self.stderr.write("Rate limited, remaining players skipped until the next run")
+                return
+
+            if games_owned:
+                yield (steam_id, games_owned)
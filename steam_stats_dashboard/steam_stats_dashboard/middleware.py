@@ -0,0 +1,23 @@
+"""
+Steam Stats Dashboard middleware module
+"""
+from .helpers.instrumentation import Instrumentation
+
+class ServerTimingMiddleware:
+    '''
+    Record Steam API, cache, and aggregation totals for each request (see helpers/instrumentation.py),
+    and report them to the browser in a Server-Timing response header
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        Instrumentation.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_metrics = Instrumentation.end_request()
+
+        response['Server-Timing'] = request_metrics.server_timing()
+        return response
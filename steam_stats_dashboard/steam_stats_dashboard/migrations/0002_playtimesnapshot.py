@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2026-10-16 23:39
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('steam_stats_dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaytimeSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('steam_id', models.CharField(max_length=20)),
+                ('taken_at', models.DateTimeField()),
+                ('is_baseline', models.BooleanField(default=False)),
+                ('app_ids', models.BinaryField()),
+                ('playtimes', models.BinaryField()),
+                ('total_delta', models.IntegerField()),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='playtimesnapshot',
+            index_together=set([('steam_id', 'taken_at')]),
+        ),
+    ]
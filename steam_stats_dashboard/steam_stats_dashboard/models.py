@@ -1,8 +1,14 @@
-from django.db import models
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import BaseUserManager, AbstractBaseUser
 
 from steam_stats_dashboard.steam_api.steam_user_profile import SteamUserProfile
 
+logger = logging.getLogger(__name__)
+
 class SteamUserManager(BaseUserManager):
     def create_user(self, steam_id, password=None):
         user = self.model(steam_id=steam_id)
@@ -27,6 +33,7 @@ class SteamUser(AbstractBaseUser):
     steam_id = models.CharField(max_length=20, unique=True)
     username = models.CharField(max_length=255) # required field for user model, but here will be unused
     is_admin = models.BooleanField(default=False)
+    last_seen = models.DateTimeField(null=True, blank=True, db_index=True) # last dashboard visit, for pre-warming
 
     USERNAME_FIELD = 'steam_id'
 
@@ -43,11 +50,48 @@ class SteamUser(AbstractBaseUser):
     def get_short_name(self):
         return self.steam_id
 
-    def load_profile(self):
-        ''' Load user's profile information from SteamAPI '''
+    def load_profile(self, load_games=True):
+        ''' Load user's profile information from SteamAPI
+            @param bool load_games: if False, games owned are only loaded on first access
+        '''
         if self.steam_id:
-            self.profile = SteamUserProfile(self.steam_id)
+            self.mark_seen()
+            self.profile = SteamUserProfile(self.steam_id, load_games=load_games)
+
+    def mark_seen(self):
+        ''' Record that the user is active, saving at most once per USER_LAST_SEEN_UPDATE_INTERVAL seconds.
+            Failing to save (e.g. before migration 0003 is applied) doesn't fail the request.
+        '''
+        now = timezone.now()
+
+        if self.last_seen is None or (now - self.last_seen).total_seconds() > settings.USER_LAST_SEEN_UPDATE_INTERVAL:
+            self.last_seen = now
+            try:
+                with transaction.atomic():
+                    self.save(update_fields=['last_seen'])
+            except DatabaseError:
+                logger.warning("Could not save last_seen for %s, are migrations applied?", self.steam_id)
 
     @property
     def is_staff(self):
         return self.is_admin
+
+class PlaytimeSnapshot(models.Model):
+    '''
+    Snapshot of a player's lifetime playtime per app (see helpers/playtime_history.py).
+    Baseline snapshots store every app's playtime_forever; the snapshots after a baseline
+    only store the apps played since the previous snapshot, and the minutes played.
+    Per app values are packed arrays of unsigned ints, ordered by app_ids.
+    '''
+    steam_id = models.CharField(max_length=20)
+    taken_at = models.DateTimeField()
+    is_baseline = models.BooleanField(default=False)
+    app_ids = models.BinaryField()
+    playtimes = models.BinaryField() # playtime_forever if baseline, otherwise mins played since previous snapshot
+    total_delta = models.IntegerField() # mins played across all apps since previous snapshot
+
+    class Meta:
+        index_together = [('steam_id', 'taken_at')]
+
+    def __str__(self):
+        return "SteamID: {}, taken at: {}".format(self.steam_id, self.taken_at)
@@ -49,6 +49,7 @@ AUTHENTICATION_BACKENDS = (
 )
 
 MIDDLEWARE = [
+    'steam_stats_dashboard.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -96,6 +97,101 @@ CACHES = {
     }
 }
 
+# Steam API HTTP session
+STEAM_API_BASE_URL = "http://api.steampowered.com"
+STEAM_API_POOL_CONNECTIONS = 4 # number of host pools kept
+STEAM_API_POOL_SIZE = 20 # max keep-alive connections per host
+STEAM_API_CONNECT_TIMEOUT = 3.05 # seconds
+STEAM_API_READ_TIMEOUT = 10 # seconds
+STEAM_API_MAX_RETRIES = 3
+STEAM_API_RETRY_BACKOFF = 0.5 # sleeps 0.5s, 1s, 2s between retries
+STEAM_API_BATCH_WORKERS = 4 # max concurrent requests for one batched call
+
+# Coalesce identical concurrent Steam API calls across processes through the cache,
+# not just within a process. Requires a cache shared by all processes (not locmem/dummy).
+STEAM_API_SINGLE_FLIGHT_CROSS_PROCESS = False
+STEAM_API_SINGLE_FLIGHT_WAIT = 15 # max seconds to wait on another process' call
+STEAM_API_SINGLE_FLIGHT_RESULT_TTL = 5 # seconds a shared result is kept for waiting processes
+
+# Steam API key rate limits
+# Per-interface token buckets: (calls per second, burst size)
+STEAM_API_RATE_LIMITS = {
+    'default': (10, 20),
+    'ISteamUserStats': (5, 10),
+}
+STEAM_API_RATE_LIMIT_MAX_WAIT = 2 # max seconds a call waits for budget before it's refused
+STEAM_API_DAILY_QUOTA = 100000 # Steam Web API terms limit a key to 100k calls per day
+STEAM_API_BATCH_QUOTA_RESERVE = 0.2 # share of the daily quota batch jobs leave for interactive requests
+STEAM_API_RETRY_AFTER = 30 # seconds clients are asked to wait when Steam is rate limited or unreachable
+
+# Steam profile data cache (stale-while-revalidate)
+STEAM_CACHE_SOFT_TTL = 3600 # 1 hour, after which cached data is refreshed in the background
+STEAM_CACHE_HARD_TTL = 43200 # 12 hours, after which cached data is dropped
+STEAM_CACHE_REFRESH_WORKERS = 4
+STEAM_CACHE_REFRESH_LOCK_TIMEOUT = 60 # seconds, in case a refresh worker dies holding the lock
+# Games owned is a large payload that changes slowly, so it's refreshed less often. Recent
+# activity (GetRecentlyPlayedGames) is small, and kept current with shorter TTLs.
+STEAM_GAMES_OWNED_SOFT_TTL = 21600 # 6 hours
+STEAM_GAMES_OWNED_HARD_TTL = 86400 # 1 day
+STEAM_RECENTLY_PLAYED_SOFT_TTL = 600 # 10 mins
+STEAM_RECENTLY_PLAYED_HARD_TTL = 3600 # 1 hour
+# Shared game catalog (app names and images, see steam_api/game_catalog.py)
+STEAM_GAME_CATALOG_TTL = 604800 # 1 week
+STEAM_GAME_CATALOG_LOCAL_SIZE = 50000 # max apps kept in process memory
+
+# Rendered dashboard panels are cached per data version. Time based averages in panels
+# drift slowly, so fragments also expire after this many seconds.
+DASHBOARD_FRAGMENT_TIMEOUT = 3600
+# The latest fragment rendered for each panel is also kept this long, and shown if Steam is
+# rate limited or unreachable when the panel needs re-rendering
+DASHBOARD_FRAGMENT_FALLBACK_TIMEOUT = 86400
+
+# Steam profile loading
+# Request games owned and friend list in parallel once a profile is known to be public
+STEAM_PROFILE_CONCURRENT_LOAD = True
+# Friend profiles are loaded a page at a time, one batched GetPlayerSummaries request per page
+STEAM_FRIEND_PAGE_SIZE = 100
+
+# Player lookups (vanity name resolutions and steam_id validations, see steam_api/lookup_index.py)
+STEAM_LOOKUP_TTL = 86400 # 1 day
+STEAM_LOOKUP_MISS_TTL = 300 # 5 mins, for names and ids that didn't match a player
+
+# Achievements (see steam_api/achievements.py)
+STEAM_ACHIEVEMENT_WORKERS = 4 # concurrent GetPlayerAchievements calls per player
+STEAM_ACHIEVEMENT_SAVE_EVERY = 20 # games loaded between progress saves
+STEAM_ACHIEVEMENT_RUNS = 2 # players loaded at once per process, separately from cache refresh workers
+STEAM_ACHIEVEMENT_RUN_SIZE = 500 # max games requested per run, the rest are left for the next run
+STEAM_ACHIEVEMENT_RUN_LOCK_TIMEOUT = 1800 # seconds, longer than a run of STEAM_ACHIEVEMENT_RUN_SIZE games
+STEAM_ACHIEVEMENT_SCHEMA_TTL = 604800 # 1 week
+STEAM_ACHIEVEMENT_PERCENTAGES_TTL = 86400 # 1 day
+STEAM_ACHIEVEMENT_PROGRESS_TTL = 2592000 # 30 days
+
+# Global per-app stats (see steam_api/app_stats.py), refreshed by manage.py refresh_app_stats
+STEAM_APP_STATS_TTL = 21600 # 6 hours, stats not refreshed since are dropped
+STEAM_APP_STATS_BATCH_SIZE = 500 # most owned apps refreshed per run
+STEAM_APP_STATS_WORKERS = 4
+# Aggregated stat names to request with GetGlobalStatsForGame, by app_id
+STEAM_APP_GLOBAL_STATS = {}
+
+# Pre-warming cached data for recently active users (manage.py prewarm_profiles)
+USER_LAST_SEEN_UPDATE_INTERVAL = 300 # seconds between SteamUser.last_seen saves
+STEAM_PREWARM_ACTIVE_DAYS = 14 # users seen within this many days are pre-warmed
+STEAM_PREWARM_INTERVAL = 900 # seconds between runs; data going stale before the next run is refetched
+STEAM_PREWARM_WORKERS = 4
+
+# Playtime history snapshots (see helpers/playtime_history.py)
+STEAM_SNAPSHOT_BASELINE_INTERVAL = 30 # store a full baseline every this many snapshots
+STEAM_SNAPSHOT_BATCH_SIZE = 500 # snapshots per bulk insert
+
+# Player JSON API (see helpers/json_api.py)
+API_PAGE_SIZE = 100 # records per page if no limit is given
+API_MAX_PAGE_SIZE = 1000
+API_STREAM_CHUNK_SIZE = 500 # records serialized per write of an NDJSON stream
+
+# Instrumentation
+# Clients allowed to scrape process-wide metrics from /metrics
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+
 # Password validation
 # https://docs.djangoproject.com/en/1.10/ref/settings/#auth-password-validators
 
@@ -0,0 +1,215 @@
+'''
+Achievements module
+
+Achievement completion needs a GetPlayerAchievements call per played game, which can be
+hundreds per player. AchievementPipeline makes those calls on a bounded worker pool,
+most played games first, and stores progress per app as results arrive (see
+ProfileCache.store_achievement_progress), so a partially loaded library can already be
+rendered, and an interrupted run (e.g. when rate limited) picks up where it left off.
+Scheduled runs have their own worker pool (STEAM_ACHIEVEMENT_RUNS), so long library
+crawls don't hold up profile cache refreshes (see background_refresh.py).
+A game is only requested again once its playtime changes, since achievements can't
+be unlocked without playing.
+
+Achievement schemas and global unlock percentages are the same for every player, so
+they're cached per app_id under CacheKey.GAME (AppAchievements). Games whose schema
+has no achievements are skipped without a player call.
+'''
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .background_refresh import BackgroundRefresh
+from .profile_cache import ProfileCache
+from .rate_limiter import RateLimiter
+from .steam_api import SteamAPI, SteamAPIError, SteamAPIInvalidResponse, SteamAPIRateLimited
+from ..helpers.cache_helper import CacheKey, build_versioned_key
+from ..helpers.instrumentation import Instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Achievement progress row fields kept per app. rarest_percent is the global unlock
+# percentage of the player's rarest unlocked achievement, None if none are unlocked.
+PROGRESS_FIELDS = (
+    'playtime_forever',
+    'unlocked',
+    'total',
+    'rarest_percent',
+)
+
+class AppAchievements:
+    ''' Achievement schemas and global unlock percentages, shared by all players '''
+
+    NAMES = 'achievement_names'
+    PERCENTAGES = 'achievement_percentages'
+
+    @classmethod
+    def get_names(cls, app_id):
+        ''' Return tuple of api names of app_id's achievements, empty if it has none '''
+        cache_key = build_versioned_key(CacheKey.GAME, app_id, cls.NAMES)
+        names = cache.get(cache_key)
+
+        if names is None:
+            response = SteamAPI.get_schema_for_game(app_id)
+            schema = response.json().get('game', {}) if response else {}
+            names = tuple(achievement['name']
+                          for achievement in schema.get('availableGameStats', {}).get('achievements', []))
+            cache.set(cache_key, names, settings.STEAM_ACHIEVEMENT_SCHEMA_TTL)
+
+        return names
+
+    @classmethod
+    def get_percentages(cls, app_id):
+        ''' Return dict of global unlock percentage by achievement api name '''
+        cache_key = build_versioned_key(CacheKey.GAME, app_id, cls.PERCENTAGES)
+        percentages = cache.get(cache_key)
+
+        if percentages is None:
+            response = SteamAPI.get_global_achievement_percentages(app_id)
+            achievements = (response.json().get('achievementpercentages', {}).get('achievements', [])
+                            if response else [])
+            percentages = tuple((achievement['name'], float(achievement['percent'])) for achievement in achievements)
+            cache.set(cache_key, percentages, settings.STEAM_ACHIEVEMENT_PERCENTAGES_TTL)
+
+        return dict(percentages)
+
+class AchievementPipeline:
+    ''' Loads players' achievement progress, a game at a time '''
+
+    _executor = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def _get_executor(cls):
+        if cls._executor is None:
+            with cls._lock:
+                if cls._executor is None:
+                    cls._executor = ThreadPoolExecutor(max_workers=settings.STEAM_ACHIEVEMENT_RUNS)
+
+        return cls._executor
+
+    @staticmethod
+    def pending(library, progress):
+        ''' Return list of (app_id, playtime_forever) for played games in library (a GameLibrary)
+            with no progress loaded since they were last played, most played first
+        '''
+        progress = progress or {}
+        played = [(app_id, playtime_mins) for app_id, playtime_mins in zip(library.app_ids, library.playtime_mins)
+                  if playtime_mins and progress.get(app_id, (None,))[0] != playtime_mins]
+
+        return sorted(played, key=lambda game: game[1], reverse=True)
+
+    @staticmethod
+    def fetch_app_progress(steam_id, app_id, playtime_forever):
+        ''' Request a player's achievements for app_id and return its progress row '''
+        names = AppAchievements.get_names(app_id)
+
+        if not names:
+            return (playtime_forever, 0, 0, None)
+
+        try:
+            response = SteamAPI.get_player_achievements(steam_id, app_id)
+        except SteamAPIInvalidResponse:
+            # Steam answers 400 for games without stats for the player
+            return (playtime_forever, 0, len(names), None)
+
+        achievements = response.json().get('playerstats', {}).get('achievements', []) if response else []
+        unlocked = [achievement['apiname'] for achievement in achievements if achievement.get('achieved')]
+        rarest_percent = None
+
+        if unlocked:
+            percentages = AppAchievements.get_percentages(app_id)
+            rarest_percent = min((percentages[name] for name in unlocked if name in percentages), default=None)
+
+        return (playtime_forever, len(unlocked), len(achievements) or len(names), rarest_percent)
+
+    @classmethod
+    def run(cls, steam_id, library, max_games=None):
+        ''' Load achievement progress for played games in library not loaded since last played.
+            Progress is saved every STEAM_ACHIEVEMENT_SAVE_EVERY games, and when the run ends.
+            Games that fail are left for the next run, and the run stops early if rate limited,
+            or the daily quota left for batch jobs is spent (see RateLimiter.batch_quota_available).
+            @param GameLibrary library: steam_id's games owned
+            @param int max_games: max games to request in this run
+            @return dict of progress rows keyed by app_id
+        '''
+        progress = ProfileCache.get_achievement_progress(steam_id) or {}
+        pending = cls.pending(library, progress)[:max_games]
+
+        if not pending:
+            return progress
+
+        num_unsaved = 0
+        fetch_app_progress = Instrumentation.bind(cls.fetch_app_progress)
+
+        with ThreadPoolExecutor(max_workers=settings.STEAM_ACHIEVEMENT_WORKERS) as executor:
+            futures = {executor.submit(fetch_app_progress, steam_id, app_id, playtime_mins): app_id
+                       for app_id, playtime_mins in pending}
+            try:
+                for future in as_completed(futures):
+                    try:
+                        progress[futures[future]] = future.result()
+                    except SteamAPIRateLimited:
+                        raise
+                    except SteamAPIError:
+                        logger.warning("Achievements not loaded for app %s, player %s", futures[future], steam_id)
+                        continue
+
+                    num_unsaved += 1
+                    if num_unsaved >= settings.STEAM_ACHIEVEMENT_SAVE_EVERY:
+                        ProfileCache.store_achievement_progress(steam_id, progress)
+                        num_unsaved = 0
+
+                    if not RateLimiter.batch_quota_available():
+                        logger.info("Batch quota spent loading achievements for player %s, resuming next run",
+                                    steam_id)
+                        break
+            except SteamAPIRateLimited:
+                logger.info("Rate limited loading achievements for player %s, resuming next run", steam_id)
+            finally:
+                # Games not requested yet are left for the next run
+                for future in futures:
+                    future.cancel()
+                ProfileCache.store_achievement_progress(steam_id, progress)
+
+        return progress
+
+    @classmethod
+    def schedule(cls, steam_id, library):
+        ''' Run the pipeline for steam_id in the background, for up to STEAM_ACHIEVEMENT_RUN_SIZE
+            games, unless nothing is pending or it's already running. Nothing is scheduled if
+            progress can't be stored (e.g. with a dummy cache), since every run would start over,
+            or if the daily quota left for batch jobs is spent, so crawls don't use up the share
+            reserved for interactive requests.
+            @return number of games pending
+        '''
+        progress = ProfileCache.get_achievement_progress(steam_id)
+
+        if progress is None:
+            # Store empty progress, so the dashboard can be versioned by it, and to check it's kept
+            ProfileCache.store_achievement_progress(steam_id, {})
+            progress = ProfileCache.get_achievement_progress(steam_id)
+            if progress is None:
+                return len(cls.pending(library, None))
+
+        pending = cls.pending(library, progress)
+
+        if pending and RateLimiter.batch_quota_available():
+            lock_key = build_versioned_key(CacheKey.USER, steam_id, 'achievement_pipeline')
+            if BackgroundRefresh.acquire([lock_key], timeout=settings.STEAM_ACHIEVEMENT_RUN_LOCK_TIMEOUT):
+                cls._get_executor().submit(cls._run_locked, lock_key, steam_id, library)
+
+        return len(pending)
+
+    @classmethod
+    def _run_locked(cls, lock_key, steam_id, library):
+        try:
+            cls.run(steam_id, library, max_games=settings.STEAM_ACHIEVEMENT_RUN_SIZE)
+        except Exception:
+            # Progress saved so far is kept, and the rest is picked up by the next run
+            logger.exception("Achievement pipeline failed for player %s", steam_id)
+        finally:
+            BackgroundRefresh.release([lock_key])
@@ -0,0 +1,78 @@
+'''
+App stats module
+
+Current player counts (GetNumberOfCurrentPlayers) and global stat totals
+(GetGlobalStatsForGame) are the same for every player, so they're stored once per
+app_id under CacheKey.GAME, each entry a tuple packed by APP_STATS_FIELDS.
+
+The store is only filled by a scheduled batch job (manage.py refresh_app_stats), which
+refreshes the apps owned by the most active users first. Dashboard panels only read
+from it (get_many), and never make per-app Steam API calls; apps not refreshed yet
+are left out.
+'''
+from collections import Counter
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .profile_cache import ProfileCache
+from .steam_api import SteamAPI
+from ..helpers.cache_helper import CacheKey, build_versioned_key
+
+APP_STATS_FIELDS = (
+    'refreshed_at',
+    'current_players',
+    'global_stats', # tuple of (stat name, total) pairs, for names in settings.STEAM_APP_GLOBAL_STATS
+)
+
+class AppStats:
+    ''' Store of global per-app stats, shared by all players '''
+
+    APP_STATS = 'app_stats'
+
+    @classmethod
+    def _key(cls, app_id):
+        return build_versioned_key(CacheKey.GAME, app_id, cls.APP_STATS)
+
+    @classmethod
+    def get_many(cls, app_ids):
+        ''' Return dict of stats dicts (see APP_STATS_FIELDS) keyed by app_id, for apps in the
+            store. Doesn't request anything from Steam.
+        '''
+        ids_by_key = {cls._key(app_id): app_id for app_id in app_ids}
+        rows = cache.get_many(list(ids_by_key))
+
+        return {ids_by_key[key]: dict(zip(APP_STATS_FIELDS, row)) for key, row in rows.items()}
+
+    @classmethod
+    def refresh(cls, app_id):
+        ''' Request app_id's current players and global stats, and store them
+            @return stored row
+        '''
+        response = SteamAPI.get_number_of_current_players(app_id)
+        current_players = response.json().get('response', {}).get('player_count') if response else None
+
+        global_stats = ()
+        stat_names = settings.STEAM_APP_GLOBAL_STATS.get(app_id)
+        if stat_names:
+            response = SteamAPI.get_global_stats_for_game(app_id, stat_names)
+            totals = response.json().get('response', {}).get('globalstats', {}) if response else {}
+            global_stats = tuple((name, int(totals[name]['total'])) for name in stat_names if name in totals)
+
+        row = (time.time(), current_players, global_stats)
+        cache.set(cls._key(app_id), row, settings.STEAM_APP_STATS_TTL)
+
+        return row
+
+    @staticmethod
+    def most_owned(steam_ids, limit):
+        ''' Return up to limit app_ids owned by the most of steam_ids, most owned first.
+            Only libraries already cached are counted, nothing is requested from Steam.
+        '''
+        owners = Counter()
+
+        for steam_id in steam_ids:
+            owners.update(ProfileCache.cached_app_ids(steam_id))
+
+        return [app_id for app_id, num_owners in owners.most_common(limit)]
@@ -0,0 +1,89 @@
+'''
+Background refresh module
+
+Runs cache refresh jobs off the request thread, so stale profile data can be served
+immediately while it's refetched. A refresh lock is held per cache key, both in-process
+and in the cache itself (shared by all processes using it), so each stale key is
+refreshed by at most one worker at a time.
+'''
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+class BackgroundRefresh:
+    ''' Shared worker pool for stale cache entry refreshes '''
+
+    _executor = None
+    _lock = threading.Lock()
+    _keys_in_flight = set()
+
+    @staticmethod
+    def _lock_key(cache_key):
+        return "{}:refresh_lock".format(cache_key)
+
+    @classmethod
+    def _get_executor(cls):
+        if cls._executor is None:
+            with cls._lock:
+                if cls._executor is None:
+                    cls._executor = ThreadPoolExecutor(max_workers=settings.STEAM_CACHE_REFRESH_WORKERS)
+
+        return cls._executor
+
+    @classmethod
+    def acquire(cls, cache_keys, timeout=None):
+        ''' Take refresh locks for as many of cache_keys as possible
+            @param int timeout: seconds before a lock held by a dead worker expires,
+            STEAM_CACHE_REFRESH_LOCK_TIMEOUT by default
+            @return list of keys now locked by the caller
+        '''
+        acquired = []
+        timeout = timeout or settings.STEAM_CACHE_REFRESH_LOCK_TIMEOUT
+
+        with cls._lock:
+            for cache_key in cache_keys:
+                if cache_key in cls._keys_in_flight:
+                    continue
+                # cache.add only succeeds if no other process holds the lock
+                if cache.add(cls._lock_key(cache_key), True, timeout):
+                    cls._keys_in_flight.add(cache_key)
+                    acquired.append(cache_key)
+
+        return acquired
+
+    @classmethod
+    def release(cls, cache_keys):
+        ''' Release refresh locks taken with acquire '''
+        with cls._lock:
+            for cache_key in cache_keys:
+                cls._keys_in_flight.discard(cache_key)
+        cache.delete_many([cls._lock_key(cache_key) for cache_key in cache_keys])
+
+    @classmethod
+    def schedule(cls, cache_keys, refresh_func):
+        ''' Queue refresh_func to run in the background for the given stale keys.
+            Keys already being refreshed are skipped, and nothing is queued if all are.
+            @param list cache_keys: stale cache keys
+            @param refresh_func: callable taking the list of keys to refresh
+        '''
+        acquired = cls.acquire(cache_keys)
+
+        if acquired:
+            cls._get_executor().submit(cls._run, acquired, refresh_func)
+
+        return acquired
+
+    @classmethod
+    def _run(cls, cache_keys, refresh_func):
+        try:
+            refresh_func(cache_keys)
+        except Exception:
+            # Stale data stays in cache until its hard TTL, so a failed refresh isn't fatal
+            logger.exception("Background refresh failed for %s", cache_keys)
+        finally:
+            cls.release(cache_keys)
@@ -0,0 +1,360 @@
+'''
+Fake Steam Web API server module
+
+Local stand-in for api.steampowered.com, for load tests and benchmarks that can't run
+against the real service. Point SteamAPI at it with settings.STEAM_API_BASE_URL (or
+SteamAPI.BASE_URL), e.g. "http://127.0.0.1:8090".
+
+Responses come from recorded fixtures when one matches the request, and otherwise from
+deterministic synthetic data (FakeSteamData), so the same steam_id always gets the same
+profile, library, and friends. Latency, error rates, and library/friend list sizes are
+configurable. Unknown requests can also be proxied to a real Steam API and recorded as
+fixtures for later replay.
+
+Run with: python manage.py fake_steam_api --port 8090
+'''
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from urllib.request import urlopen
+from urllib.error import HTTPError, URLError
+import json
+import random
+import threading
+import time
+
+# Params that don't change the response, and are left out of fixture keys
+IGNORED_PARAMS = ('key', 'format')
+
+STEAM_ID_BASE = 76561197960265728
+COMMUNITY_VISIBILITY_STATE_PRIVATE = 1
+COMMUNITY_VISIBILITY_STATE_PUBLIC = 3
+
+class FakeSteamData:
+    ''' Deterministic synthetic Steam data, generated per steam_id from a seed '''
+
+    def __init__(self, seed=0, num_games=100, num_friends=50, private_ratio=0.1, catalog_size=None):
+        ''' @param int num_games: number of games owned by each player
+            @param int num_friends: number of friends each player has
+            @param float private_ratio: share of players with private profiles (0-1)
+            @param int catalog_size: number of distinct apps games are picked from
+            (default 2 * num_games, min 1000), so libraries overlap between players
+        '''
+        self.seed = seed
+        self.num_games = num_games
+        self.num_friends = num_friends
+        self.private_ratio = private_ratio
+        self.catalog_size = max(catalog_size or num_games * 2, num_games, 1000)
+        self._owned_games = {} # generated libraries, since large ones are slow to build
+
+    def _random(self, *parts):
+        return random.Random("{}:{}".format(self.seed, ":".join(str(part) for part in parts)))
+
+    def is_public(self, steam_id):
+        return self._random(steam_id, 'visibility').random() >= self.private_ratio
+
+    def app(self, app_id):
+        ''' Return app info shared by every owner of app_id '''
+        return {
+            'appid': app_id,
+            'name': "Synthetic Game {}".format(app_id),
+            'img_icon_url': "{:040x}".format(self._random(app_id, 'icon').getrandbits(160)),
+            'img_logo_url': "{:040x}".format(self._random(app_id, 'logo').getrandbits(160)),
+        }
+
+    def player_summary(self, steam_id):
+        rand = self._random(steam_id, 'summary')
+        summary = {
+            'steamid': str(steam_id),
+            'communityvisibilitystate': COMMUNITY_VISIBILITY_STATE_PRIVATE,
+            'profilestate': 1,
+            'personaname': "player_{}".format(int(steam_id) - STEAM_ID_BASE),
+            'profileurl': "http://steamcommunity.com/profiles/{}/".format(steam_id),
+            'avatar': "http://cdn.example.com/avatars/{}.jpg".format(steam_id),
+            'avatarmedium': "http://cdn.example.com/avatars/{}_medium.jpg".format(steam_id),
+            'avatarfull': "http://cdn.example.com/avatars/{}_full.jpg".format(steam_id),
+            'personastate': rand.randint(0, 6),
+        }
+        if self.is_public(steam_id):
+            summary['communityvisibilitystate'] = COMMUNITY_VISIBILITY_STATE_PUBLIC
+            summary['timecreated'] = rand.randint(1063407600, 1480000000)
+
+        return summary
+
+    def owned_games(self, steam_id, include_appinfo=True):
+        if (steam_id, include_appinfo) not in self._owned_games:
+            self._owned_games[(steam_id, include_appinfo)] = self._generate_owned_games(steam_id, include_appinfo)
+        return [dict(game) for game in self._owned_games[(steam_id, include_appinfo)]]
+
+    def _generate_owned_games(self, steam_id, include_appinfo):
+        rand = self._random(steam_id, 'games')
+        games = []
+
+        for app_id in sorted(rand.sample(range(10, (self.catalog_size + 1) * 10, 10), self.num_games)):
+            # Roughly a third of a library is never played, as is typical of Steam accounts
+            playtime_forever = 0 if rand.random() < 0.35 else int(rand.paretovariate(1.2) * 60)
+            game = self.app(app_id) if include_appinfo else {'appid': app_id}
+            game['playtime_forever'] = playtime_forever
+            if playtime_forever and rand.random() < 0.05:
+                game['playtime_2weeks'] = min(playtime_forever, rand.randint(1, 20160))
+            games.append(game)
+
+        return games
+
+    def achievement_names(self, app_id):
+        ''' Return api names of app_id's achievements. About a third of apps have none. '''
+        rand = self._random(app_id, 'achievements')
+        num_achievements = 0 if rand.random() < 0.3 else rand.randint(1, 60)
+        return ["ACH_{}_{}".format(app_id, index) for index in range(num_achievements)]
+
+    def unlocked_achievements(self, steam_id, app_id, playtime_forever):
+        ''' Return set of achievement names unlocked by steam_id, more of them the longer it's been played '''
+        rand = self._random(steam_id, app_id, 'unlocked')
+        unlock_chance = min(playtime_forever / 3000, 1) if playtime_forever else 0
+        return {name for name in self.achievement_names(app_id) if rand.random() < unlock_chance}
+
+    def friend_ids(self, steam_id):
+        rand = self._random(steam_id, 'friends')
+        return [str(STEAM_ID_BASE + rand.randint(1, 10 ** 9)) for _ in range(self.num_friends)]
+
+    def resolve_vanity_url(self, vanity_url):
+        ''' Return steam_id for vanity names of the form player_<n>, as used in personaname '''
+        prefix, _, number = vanity_url.partition('_')
+        if prefix == 'player' and number.isdigit():
+            return str(STEAM_ID_BASE + int(number))
+        return None
+
+    ########## Responses, by "<interface>/<method>" ##########
+
+    def response(self, interface, method, params):
+        ''' Return (status code, response body dict) for a request '''
+        handler = getattr(self, "_{}_{}".format(interface, method), None)
+
+        if handler is None:
+            return (404, {'error': "Unknown method {}/{}".format(interface, method)})
+
+        return handler(params)
+
+    def _ISteamUser_GetPlayerSummaries(self, params):
+        steam_ids = [steam_id for steam_id in params.get('steamids', '').split(',') if steam_id.isdigit()]
+        if len(steam_ids) > 100:
+            return (400, {'error': 'Too many steam ids'})
+        return (200, {'response': {'players': [self.player_summary(steam_id) for steam_id in steam_ids]}})
+
+    def _ISteamUser_GetFriendList(self, params):
+        steam_id = params.get('steamid', '0')
+        if not self.is_public(steam_id):
+            return (401, {})
+        friends = [{'steamid': friend_id, 'relationship': 'friend', 'friend_since': 1300000000}
+                   for friend_id in self.friend_ids(steam_id)]
+        return (200, {'friendslist': {'friends': friends}})
+
+    def _ISteamUser_ResolveVanityURL(self, params):
+        steam_id = self.resolve_vanity_url(params.get('vanityurl', ''))
+        if steam_id:
+            return (200, {'response': {'steamid': steam_id, 'success': 1}})
+        return (200, {'response': {'success': 42, 'message': 'No match'}})
+
+    def _IPlayerService_GetOwnedGames(self, params):
+        steam_id = params.get('steamid', '0')
+        if not self.is_public(steam_id):
+            return (200, {'response': {}})
+        games = self.owned_games(steam_id, include_appinfo=params.get('include_appinfo', '0') == '1')
+        return (200, {'response': {'game_count': len(games), 'games': games}})
+
+    def _IPlayerService_GetRecentlyPlayedGames(self, params):
+        steam_id = params.get('steamid', '0')
+        if not self.is_public(steam_id):
+            return (200, {'response': {}})
+        games = [game for game in self.owned_games(steam_id) if game.get('playtime_2weeks')]
+        return (200, {'response': {'total_count': len(games), 'games': games}})
+
+    def _ISteamUserStats_GetSchemaForGame(self, params):
+        app_id = int(params.get('appid', 0))
+        achievements = [{'name': name, 'defaultvalue': 0, 'displayName': name.title().replace('_', ' '),
+                         'hidden': 0, 'icon': "http://cdn.example.com/achievements/{}.jpg".format(name)}
+                        for name in self.achievement_names(app_id)]
+        game = {'gameName': self.app(app_id)['name'], 'gameVersion': '1'}
+        if achievements:
+            game['availableGameStats'] = {'achievements': achievements}
+        return (200, {'game': game})
+
+    def _ISteamUserStats_GetPlayerAchievements(self, params):
+        steam_id, app_id = params.get('steamid', '0'), int(params.get('appid', 0))
+        if not self.is_public(steam_id):
+            return (403, {'playerstats': {'error': 'Profile is not public', 'success': False}})
+
+        owned = {game['appid']: game for game in self.owned_games(steam_id, include_appinfo=False)}
+        if app_id not in owned or not self.achievement_names(app_id):
+            return (400, {'playerstats': {'error': 'Requested app has no stats', 'success': False}})
+
+        unlocked = self.unlocked_achievements(steam_id, app_id, owned[app_id]['playtime_forever'])
+        achievements = [{'apiname': name, 'achieved': int(name in unlocked),
+                         'unlocktime': 1400000000 if name in unlocked else 0}
+                        for name in self.achievement_names(app_id)]
+        return (200, {'playerstats': {'steamID': steam_id, 'gameName': self.app(app_id)['name'],
+                                      'achievements': achievements, 'success': True}})
+
+    def _ISteamUserStats_GetGlobalAchievementPercentagesForApp(self, params):
+        app_id = int(params.get('gameid', 0))
+        rand = self._random(app_id, 'percentages')
+        percentages = sorted((round(rand.uniform(0.1, 90), 1) for _ in self.achievement_names(app_id)), reverse=True)
+        achievements = [{'name': name, 'percent': percent}
+                        for name, percent in zip(self.achievement_names(app_id), percentages)]
+        return (200, {'achievementpercentages': {'achievements': achievements}})
+
+    def _ISteamUserStats_GetNumberOfCurrentPlayers(self, params):
+        app_id = int(params.get('appid', 0))
+        return (200, {'response': {'player_count': int(self._random(app_id, 'players').paretovariate(1) * 10),
+                                   'result': 1}})
+
+    def _ISteamUserStats_GetGlobalStatsForGame(self, params):
+        app_id = int(params.get('appid', 0))
+        stat_names = [params['name[{}]'.format(index)] for index in range(int(params.get('count', 0)))
+                      if 'name[{}]'.format(index) in params]
+        global_stats = {name: {'total': str(self._random(app_id, name).randint(0, 10 ** 9))} for name in stat_names}
+        return (200, {'response': {'globalstats': global_stats, 'result': 1}})
+
+class FixtureStore:
+    ''' Recorded responses keyed by request path and params (see fixture_key) '''
+
+    def __init__(self, path=None):
+        self.path = path
+        self.fixtures = {}
+        self._lock = threading.Lock()
+
+        if path:
+            try:
+                with open(path) as fixture_file:
+                    self.fixtures = json.load(fixture_file)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def fixture_key(path, params):
+        ''' Return key for a request, e.g. "/ISteamUser/GetFriendList/v0001?steamid=123" '''
+        params = sorted((name, value) for name, value in params.items() if name not in IGNORED_PARAMS)
+        return "{}?{}".format(path.rstrip('/'), urlencode(params))
+
+    def get(self, path, params):
+        ''' Return recorded (status code, body) or None '''
+        fixture = self.fixtures.get(self.fixture_key(path, params))
+        return (fixture['status'], fixture['body']) if fixture else None
+
+    def record(self, path, params, status, body):
+        with self._lock:
+            self.fixtures[self.fixture_key(path, params)] = {'status': status, 'body': body}
+            if self.path:
+                with open(self.path, 'w') as fixture_file:
+                    json.dump(self.fixtures, fixture_file, indent=1, sort_keys=True)
+
+class FakeSteamAPIHandler(BaseHTTPRequestHandler):
+    ''' Request handler for FakeSteamAPIServer '''
+
+    protocol_version = 'HTTP/1.1' # keep-alive, like the real API
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        server.count_request()
+
+        if server.latency_ms or server.jitter_ms:
+            time.sleep(max(server.latency_ms + random.uniform(-server.jitter_ms, server.jitter_ms), 0) / 1000)
+
+        if server.throttle_rate and random.random() < server.throttle_rate:
+            return self._respond(429, {})
+        if server.error_rate and random.random() < server.error_rate:
+            return self._respond(500, {})
+
+        response = server.fixtures.get(url.path, params)
+
+        if response is None and server.record_from:
+            response = self._proxy(url)
+            # Don't record upstream being unreachable, so the request is proxied again next time
+            if response[0] != 502:
+                server.fixtures.record(url.path, params, *response)
+
+        if response is None:
+            parts = url.path.strip('/').split('/')
+            if len(parts) == 3:
+                response = server.data.response(parts[0], parts[1], params)
+            else:
+                response = (404, {})
+
+        self._respond(*response)
+
+    def _proxy(self, url):
+        ''' Forward request to server.record_from and return (status code, body) '''
+        try:
+            with urlopen(server_url(self.server.record_from, url)) as upstream:
+                return (upstream.status, json.loads(upstream.read().decode('utf-8')))
+        except HTTPError as e:
+            return (e.code, {})
+        except (URLError, OSError):
+            # Upstream unreachable or timed out
+            return (502, {})
+
+    def _respond(self, status, body):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def server_url(base_url, url):
+    ''' Return base_url joined with the path and query of url (a SplitResult) '''
+    return "{}{}{}".format(base_url.rstrip('/'), url.path, "?" + url.query if url.query else "")
+
+class FakeSteamAPIServer(ThreadingMixIn, HTTPServer):
+    ''' Threaded HTTP server serving the fake Steam Web API '''
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=8090, data=None, fixtures=None, latency_ms=0, jitter_ms=0,
+                 error_rate=0, throttle_rate=0, record_from=None, verbose=False):
+        ''' @param FakeSteamData data: synthetic data source for requests without a fixture
+            @param FixtureStore fixtures: recorded responses, replayed when matched
+            @param float latency_ms: mean delay added to each response
+            @param float jitter_ms: max random deviation from latency_ms
+            @param float error_rate: share of requests answered with a 500 (0-1)
+            @param float throttle_rate: share of requests answered with a 429 (0-1)
+            @param str record_from: base url of a real Steam API to proxy and record unmatched requests from
+        '''
+        super().__init__((host, port), FakeSteamAPIHandler)
+        self.data = data or FakeSteamData()
+        self.fixtures = fixtures or FixtureStore()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.record_from = record_from
+        self.verbose = verbose
+
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        ''' Return url to use as SteamAPI.BASE_URL '''
+        host, port = self.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def count_request(self):
+        with self._count_lock:
+            self.request_count += 1
+
+    def start(self):
+        ''' Serve in a background daemon thread and return the thread '''
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
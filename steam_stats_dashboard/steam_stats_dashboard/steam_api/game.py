@@ -4,22 +4,13 @@ Game object module
 
 from ..helpers.time_calc import TimeCalc
 
-class Game:
-    ''' Game object class, representing a Steam game owned by a player '''
-    def __init__(self, game_dict, playtime_mins_two_weeks):
-        ''' Instantiate game object
-            @param game_dict: data for an individual game, from full game json response
-            @param int playtime_mins_two_weeks: number of mins the game has been played by
-            player over the past two weeks
-        '''
-        self.app_id = game_dict['appid']
-        self.name = game_dict['name']
-        self._icon_img = game_dict['img_icon_url']
-        self._logo_img = game_dict['img_logo_url']
+IMG_URL = "http://media.steampowered.com/steamcommunity/public/images/apps/{0}/{1}.jpg"
 
-        # Player-specific fields
-        self.playtime_mins = game_dict['playtime_forever']
-        self.playtime_mins_two_weeks = playtime_mins_two_weeks
+class GameMixin:
+    ''' Properties shared by Game and GameView (game_library.py). Expects app_id, name,
+        playtime_mins, _icon_img and _logo_img attributes.
+    '''
+    __slots__ = ()
 
     def __repr__(self):
         return "{0} - App ID: {1}".format(self.name, self.app_id)
@@ -27,12 +18,12 @@ class Game:
     @property
     def icon_img(self):
         ''' Build and return full url for game icon img '''
-        return "http://media.steampowered.com/steamcommunity/public/images/apps/{0}/{1}.jpg".format(self.app_id, self._icon_img)
+        return IMG_URL.format(self.app_id, self._icon_img)
 
     @property
     def logo_img(self):
         ''' Build and return full url for game logo img '''
-        return "http://media.steampowered.com/steamcommunity/public/images/apps/{0}/{1}.jpg".format(self.app_id, self._logo_img)
+        return IMG_URL.format(self.app_id, self._logo_img)
 
     @property
     def time_played_total_dict(self):
@@ -45,3 +36,20 @@ class Game:
     def time_played_total_hours(self):
         ''' Convert number of mins game has been played from mins to hours '''
         return TimeCalc.hours_from_minutes(self.playtime_mins)
+
+class Game(GameMixin):
+    ''' Game object class, representing a Steam game owned by a player '''
+    def __init__(self, game_dict, playtime_mins_two_weeks):
+        ''' Instantiate game object
+            @param game_dict: data for an individual game, from full game json response
+            @param int playtime_mins_two_weeks: number of mins the game has been played by
+            player over the past two weeks
+        '''
+        self.app_id = game_dict['appid']
+        self.name = game_dict['name']
+        self._icon_img = game_dict['img_icon_url']
+        self._logo_img = game_dict['img_logo_url']
+
+        # Player-specific fields
+        self.playtime_mins = game_dict['playtime_forever']
+        self.playtime_mins_two_weeks = playtime_mins_two_weeks
@@ -0,0 +1,83 @@
+'''
+Game catalog module
+
+App info (name, icon and logo image hashes) is the same for every owner of a game, so
+it's cached once per app_id under CacheKey.GAME and shared by all users, instead of being
+repeated in every user's cached library. Each entry is a tuple packed by APP_FIELDS.
+
+The catalog is filled from GetOwnedGames responses requested with include_appinfo=1
+(see ProfileCache.get_games_owned). App info rarely changes, so entries are kept for
+STEAM_GAME_CATALOG_TTL seconds, and hot entries are also kept in process memory.
+'''
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ..helpers.cache_helper import CacheKey, build_versioned_key
+
+# GetOwnedGames app info fields kept per app
+APP_FIELDS = (
+    'name',
+    'img_icon_url',
+    'img_logo_url',
+)
+
+class GameCatalog:
+    ''' Shared cache of app info rows keyed by app_id '''
+
+    APP_INFO = 'app_info'
+
+    _local = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def _key(cls, app_id):
+        return build_versioned_key(CacheKey.GAME, app_id, cls.APP_INFO)
+
+    @classmethod
+    def get_many(cls, app_ids):
+        ''' Return dict of app info rows keyed by app_id, for app_ids in the catalog '''
+        rows_by_id = {}
+        missing_ids = []
+
+        for app_id in app_ids:
+            row = cls._local.get(app_id)
+            if row is None:
+                missing_ids.append(app_id)
+            else:
+                rows_by_id[app_id] = row
+
+        if missing_ids:
+            ids_by_key = {cls._key(app_id): app_id for app_id in missing_ids}
+            cached_rows = {ids_by_key[key]: row for key, row in cache.get_many(list(ids_by_key)).items()}
+            cls._remember(cached_rows)
+            rows_by_id.update(cached_rows)
+
+        return rows_by_id
+
+    @classmethod
+    def store(cls, games):
+        ''' Add app info from GetOwnedGames game dicts (requested with include_appinfo=1)
+            @return dict of app info rows keyed by app_id
+        '''
+        rows_by_id = {game['appid']: tuple(game.get(field) for field in APP_FIELDS)
+                      for game in games if 'name' in game}
+        cache.set_many({cls._key(app_id): row for app_id, row in rows_by_id.items()}, settings.STEAM_GAME_CATALOG_TTL)
+        cls._remember(rows_by_id)
+
+        return rows_by_id
+
+    @classmethod
+    def _remember(cls, rows_by_id):
+        ''' Keep rows in process memory, starting over once STEAM_GAME_CATALOG_LOCAL_SIZE is reached '''
+        with cls._lock:
+            if len(cls._local) + len(rows_by_id) > settings.STEAM_GAME_CATALOG_LOCAL_SIZE:
+                cls._local = {}
+            cls._local.update(rows_by_id)
+
+    @classmethod
+    def clear_local(cls):
+        ''' Drop rows kept in process memory '''
+        with cls._lock:
+            cls._local = {}
@@ -0,0 +1,121 @@
+'''
+Game library module
+
+GameLibrary holds a player's owned games in parallel arrays (one entry per game)
+rather than one Game object per title, so large libraries are cheap to build and
+hold in memory. Game names and image hashes are interned, so titles owned by many
+players share one string per process.
+
+Iterating or indexing a GameLibrary returns GameView objects, which read from the
+arrays on access and provide the same attributes as Game for use in templates.
+'''
+from array import array
+import sys
+
+from .game import GameMixin
+from ..helpers.library_ranking import LibraryRanking
+from ..helpers.library_stats import LibraryStats
+
+class GameView(GameMixin):
+    ''' Game-like view of one game in a GameLibrary '''
+    __slots__ = ('_library', '_index')
+
+    def __init__(self, library, index):
+        self._library = library
+        self._index = index
+
+    def __eq__(self, other):
+        return isinstance(other, GameView) and self._library is other._library and self._index == other._index
+
+    def __hash__(self):
+        return hash((id(self._library), self._index))
+
+    @property
+    def app_id(self):
+        return self._library.app_ids[self._index]
+
+    @property
+    def name(self):
+        return self._library.names[self._index]
+
+    @property
+    def playtime_mins(self):
+        return self._library.playtime_mins[self._index]
+
+    @property
+    def playtime_mins_two_weeks(self):
+        return self._library.playtime_mins_two_weeks[self._index]
+
+    @property
+    def _icon_img(self):
+        return self._library.icon_imgs[self._index]
+
+    @property
+    def _logo_img(self):
+        return self._library.logo_imgs[self._index]
+
+class GameLibrary:
+    ''' Array-backed collection of the games owned by a player '''
+
+    def __init__(self, games_owned=None):
+        ''' @param list games_owned: game dicts, as returned by ProfileCache.get_games_owned '''
+        self.app_ids = array('l')
+        self.playtime_mins = array('l')
+        self.playtime_mins_two_weeks = array('l')
+        self.names = []
+        self.icon_imgs = []
+        self.logo_imgs = []
+        self._stats = None
+        self._ranking = None
+
+        for game in games_owned or []:
+            self.append(game)
+
+    def __len__(self):
+        return len(self.app_ids)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield GameView(self, index)
+
+    def __getitem__(self, index):
+        ''' Return GameView for an index, or list of GameViews for a slice '''
+        if isinstance(index, slice):
+            return [GameView(self, i) for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("GameLibrary index out of range")
+
+        return GameView(self, index)
+
+    def __repr__(self):
+        return "<GameLibrary> {} games".format(len(self))
+
+    @property
+    def stats(self):
+        ''' Return LibraryStats for the library, computed on first use '''
+        if self._stats is None:
+            self._stats = LibraryStats(self)
+        return self._stats
+
+    @property
+    def ranking(self):
+        ''' Return LibraryRanking for the library, created on first use '''
+        if self._ranking is None:
+            self._ranking = LibraryRanking(self)
+        return self._ranking
+
+    def append(self, game_dict):
+        ''' Add a game to the library
+            @param dict game_dict: data for an individual game, from games owned json
+        '''
+        self.app_ids.append(game_dict['appid'])
+        self.playtime_mins.append(game_dict.get('playtime_forever') or 0)
+        self.playtime_mins_two_weeks.append(game_dict.get('playtime_2weeks') or 0)
+        self.names.append(sys.intern(game_dict.get('name') or ''))
+        self.icon_imgs.append(sys.intern(game_dict.get('img_icon_url') or ''))
+        self.logo_imgs.append(sys.intern(game_dict.get('img_logo_url') or ''))
+        self._stats = None
+        self._ranking = None
@@ -0,0 +1,96 @@
+'''
+Lookup index module
+
+Caches the outcome of manual player lookups (views.get_steam_id_public): vanity names
+resolved to steam_ids, and steam_ids validated as existing players. Misses (ResolveVanityURL
+"No match", or an id Steam has no player for) are cached too, for STEAM_LOOKUP_MISS_TTL
+seconds, so repeated typos and bot traffic don't each cost a Steam API call. Input that
+can't be a vanity name or steam_id is rejected without calling Steam at all.
+
+Steam ids found by a lookup are recorded as valid, so the player_stats redirect that
+follows doesn't validate them again.
+'''
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .profile_cache import ProfileCache
+from .steam_api import SteamAPI
+from ..helpers.cache_helper import CacheKey, build_versioned_key
+
+# Steam custom urls are 3-32 letters, digits, underscores, and hyphens
+VANITY_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]{3,32}$')
+STEAM_ID_PATTERN = re.compile(r'^[0-9]{17}$')
+
+class LookupIndex:
+    ''' Cached vanity name resolutions and steam_id validations '''
+
+    VANITY_NAME = 'vanity_name'
+    STEAM_ID_VALID = 'steam_id_valid'
+    NO_MATCH = '' # cached for vanity names that didn't resolve
+
+    @classmethod
+    def resolve_vanity_name(cls, vanity_name):
+        ''' Return steam_id for vanity_name or None if it doesn't match a player '''
+        if not VANITY_NAME_PATTERN.match(vanity_name):
+            return None
+
+        # Custom urls are case insensitive
+        cache_key = build_versioned_key(CacheKey.STEAM_API, vanity_name.lower(), cls.VANITY_NAME)
+        steam_id = cache.get(cache_key)
+
+        if steam_id is None:
+            steam_id = cls._fetch_vanity_name(vanity_name)
+            cache.set(cache_key, steam_id or cls.NO_MATCH,
+                      settings.STEAM_LOOKUP_TTL if steam_id else settings.STEAM_LOOKUP_MISS_TTL)
+            if steam_id:
+                cls._set_valid(steam_id, True)
+
+        return steam_id or None
+
+    @staticmethod
+    def _fetch_vanity_name(vanity_name):
+        ''' Request steam_id for vanity_name and return it or None
+
+            invalid response: {'response': {'message': 'No match', 'success': 42}}
+            valid response: { "response": { "steamid": "76561197969470540", "success": 1 } }
+        '''
+        response = SteamAPI.resolve_vanity_url(vanity_name)
+
+        if not response:
+            return None
+
+        response = response.json().get('response', {})
+
+        if response.get('success') == SteamAPI.NAME_SUCCESS_MATCH:
+            return response.get('steamid')
+
+        return None
+
+    @classmethod
+    def is_valid_steam_id(cls, steam_id):
+        ''' Return True if steam_id belongs to a Steam player. The player summary fetched to
+            check is cached for later profile loads (see ProfileCache.get_profile).
+        '''
+        steam_id = str(steam_id)
+
+        if not STEAM_ID_PATTERN.match(steam_id):
+            return False
+
+        is_valid = cache.get(cls._valid_key(steam_id))
+
+        if is_valid is None:
+            is_valid = ProfileCache.get_profile(steam_id) is not None
+            cls._set_valid(steam_id, is_valid)
+
+        return is_valid
+
+    @classmethod
+    def _valid_key(cls, steam_id):
+        return build_versioned_key(CacheKey.USER, steam_id, cls.STEAM_ID_VALID)
+
+    @classmethod
+    def _set_valid(cls, steam_id, is_valid):
+        cache.set(cls._valid_key(steam_id), is_valid,
+                  settings.STEAM_LOOKUP_TTL if is_valid else settings.STEAM_LOOKUP_MISS_TTL)
@@ -0,0 +1,459 @@
+'''
+Profile cache module
+
+Caches parsed Steam API payloads used to build SteamUserProfile. Only the fields
+read by SteamUserProfile are kept, and each record is packed into a tuple ordered
+by the matching *_FIELDS constant, instead of storing whole requests.Response objects.
+Keys include the cache schema version (see cache_helper.build_versioned_key), so
+changing a *_FIELDS tuple only requires bumping CACHE_SCHEMA_VERSION. Libraries are
+cached as app ids and playtimes only, and joined with app info from the shared game
+catalog (see game_catalog.py) when read.
+
+Entries use soft/hard TTLs (stale-while-revalidate). An entry is kept in cache for
+STEAM_CACHE_HARD_TTL seconds; once older than STEAM_CACHE_SOFT_TTL it's still returned,
+and a background refresh is scheduled (see background_refresh.py).
+'''
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .background_refresh import BackgroundRefresh
+from .game_catalog import GameCatalog
+from .steam_api import SteamAPI, SteamAPIRateLimited
+from ..helpers.cache_helper import CacheKey, build_versioned_key
+from ..helpers.instrumentation import Instrumentation
+
+# GetPlayerSummaries fields kept per player
+PROFILE_FIELDS = (
+    'steamid',
+    'communityvisibilitystate',
+    'profileurl',
+    'personaname',
+    'avatar',
+    'avatarmedium',
+    'avatarfull',
+    'timecreated',
+)
+
+# GetOwnedGames fields kept per game in a user's library. App info is shared by
+# all users in the game catalog (see game_catalog.py).
+OWNED_GAME_FIELDS = (
+    'appid',
+    'playtime_forever',
+    'playtime_2weeks',
+)
+
+# Game dict fields returned by get_games_owned, joined from the library and catalog
+GAME_FIELDS = (
+    'appid',
+    'name',
+    'img_icon_url',
+    'img_logo_url',
+    'playtime_forever',
+    'playtime_2weeks',
+)
+
+def pack(record, fields):
+    ''' Return tuple of record values ordered by fields '''
+    return tuple(record.get(field) for field in fields)
+
+def unpack(row, fields):
+    ''' Return dict built from a tuple packed with the same fields '''
+    return dict(zip(fields, row))
+
+class ProfileCache:
+    ''' Read-through cache of trimmed Steam API payloads for a steam_id '''
+
+    PROFILE = 'profile_data'
+    GAMES_OWNED = 'games_owned'
+    RECENTLY_PLAYED = 'recently_played'
+    FRIEND_IDS = 'friend_ids'
+    ACHIEVEMENT_PROGRESS = 'achievement_progress'
+
+    @staticmethod
+    def _key(steam_id, value_name):
+        return build_versioned_key(CacheKey.USER, steam_id, value_name)
+
+    ########## Cache entries ##########
+
+    @staticmethod
+    def _entry(value):
+        ''' Return cache entry for value: (time stored, value, content digest) '''
+        return (time.time(), value, hashlib.sha1(repr(value).encode('utf-8')).hexdigest())
+
+    @classmethod
+    def _ttls(cls, value_name):
+        ''' Return (soft TTL, hard TTL) in seconds for value_name. Games owned are a large
+            payload that changes slowly, so it's refreshed less often than recent activity.
+        '''
+        if value_name == cls.GAMES_OWNED:
+            return (settings.STEAM_GAMES_OWNED_SOFT_TTL, settings.STEAM_GAMES_OWNED_HARD_TTL)
+        if value_name == cls.RECENTLY_PLAYED:
+            return (settings.STEAM_RECENTLY_PLAYED_SOFT_TTL, settings.STEAM_RECENTLY_PLAYED_HARD_TTL)
+        if value_name == cls.ACHIEVEMENT_PROGRESS:
+            # Built up by the achievement pipeline rather than refreshed, so it's never stale
+            return (settings.STEAM_ACHIEVEMENT_PROGRESS_TTL, settings.STEAM_ACHIEVEMENT_PROGRESS_TTL)
+        return (settings.STEAM_CACHE_SOFT_TTL, settings.STEAM_CACHE_HARD_TTL)
+
+    @classmethod
+    def _is_stale(cls, entry, value_name=None):
+        ''' Return True if entry is older than the soft TTL for value_name '''
+        return time.time() - entry[0] > cls._ttls(value_name)[0]
+
+    @classmethod
+    def _fetch_and_set(cls, cache_key, value_name, fetch_func):
+        ''' Call fetch_func and cache its result. None results (data unavailable) aren't cached. '''
+        value = fetch_func()
+
+        if value is not None:
+            cache.set(cache_key, cls._entry(value), cls._ttls(value_name)[1])
+
+        return value
+
+    @classmethod
+    def _get_or_fetch(cls, cache_key, value_name, fetch_func):
+        ''' Return cached value for cache_key, calling fetch_func to populate it on a miss.
+            Stale values are returned as is, and refreshed in the background.
+            @param str value_name: name of the cached value, used for its TTLs and to record
+            hits and misses under (see instrumentation.py)
+        '''
+        entry = cache.get(cache_key)
+        Instrumentation.record_cache_lookup(value_name, hits=int(entry is not None), misses=int(entry is None))
+
+        if entry is None:
+            return cls._fetch_and_set(cache_key, value_name, fetch_func)
+
+        if cls._is_stale(entry, value_name):
+            cls._schedule_refresh(cache_key, value_name, fetch_func)
+
+        return entry[1]
+
+    @classmethod
+    def _schedule_refresh(cls, cache_key, value_name, fetch_func):
+        ''' Queue a background refetch of a stale value, unless it's already being refreshed
+            @return list of cache keys queued
+        '''
+        return BackgroundRefresh.schedule([cache_key],
+                                          lambda keys: cls._fetch_and_set(cache_key, value_name, fetch_func))
+
+    @classmethod
+    def refresh_stale(cls, steam_id, value_names):
+        ''' Queue background refreshes of steam_id's cached games owned, recently played games,
+            and friend ids in value_names that are past their soft TTL, without reading them.
+            For callers reusing output rendered from cached values (e.g. dashboard fragments),
+            which otherwise wouldn't read a stale value through the cache until it expires.
+            @return list of cache keys queued
+        '''
+        fetch_funcs = {
+            cls.GAMES_OWNED: lambda: cls._fetch_games_owned(steam_id),
+            cls.RECENTLY_PLAYED: lambda: cls._fetch_recently_played(steam_id),
+            cls.FRIEND_IDS: lambda: cls._fetch_friend_ids(steam_id),
+        }
+        keys_by_name = {value_name: cls._key(steam_id, value_name)
+                        for value_name in value_names if value_name in fetch_funcs}
+        entries = cache.get_many(list(keys_by_name.values()))
+        cache_keys = []
+
+        for value_name, key in keys_by_name.items():
+            if key in entries and cls._is_stale(entries[key], value_name):
+                cache_keys += cls._schedule_refresh(key, value_name, fetch_funcs[value_name])
+
+        return cache_keys
+
+    @classmethod
+    def data_version(cls, steam_id, value_names=(PROFILE, GAMES_OWNED), fresh_only=False):
+        ''' Return (version, last_modified) for the cached values of steam_id (by default,
+            profile and games owned), without requesting anything from Steam. version is a
+            digest of the cached content, and last_modified the epoch time it was last stored.
+            @param bool fresh_only: return None if any value is past its soft TTL, so callers
+            read it through the cache (and schedule its refresh) instead of reusing the version
+            @return tuple or None if any isn't cached
+        '''
+        keys = [cls._key(steam_id, value_name) for value_name in value_names]
+        entries = cache.get_many(keys)
+
+        if len(entries) < len(keys):
+            return None
+
+        if fresh_only and any(cls._is_stale(entries[key], value_name) for key, value_name in zip(keys, value_names)):
+            return None
+
+        version = hashlib.sha1(":".join(entries[key][2] for key in keys).encode('utf-8')).hexdigest()
+        last_modified = max(entry[0] for entry in entries.values())
+
+        return (version, last_modified)
+
+    ########## Player summaries ##########
+
+    @classmethod
+    def get_profile(cls, steam_id):
+        ''' Return player summary dict for steam_id or None '''
+        profiles = cls.get_player_summaries([steam_id])
+        return profiles[0] if profiles else None
+
+    @classmethod
+    def get_player_summaries(cls, steam_ids, allow_partial=False):
+        ''' Return list of player summary dicts for steam_ids, in the order given.
+            Cached summaries are reused, and only missing ids are requested from Steam
+            (in batches, see SteamAPI.get_player_summaries_batched).
+            @param bool allow_partial: if rate limited, return only the cached summaries
+            instead of raising SteamAPIRateLimited
+        '''
+        steam_ids = [str(steam_id) for steam_id in steam_ids]
+        ids_by_key = {cls._key(steam_id, cls.PROFILE): steam_id for steam_id in steam_ids}
+        cached_entries = cache.get_many(list(ids_by_key))
+
+        rows_by_id = {ids_by_key[key]: entry[1] for key, entry in cached_entries.items()}
+        missing_ids = [steam_id for steam_id in steam_ids if steam_id not in rows_by_id]
+        Instrumentation.record_cache_lookup(cls.PROFILE, hits=len(cached_entries), misses=len(missing_ids))
+        stale_keys = [key for key, entry in cached_entries.items() if cls._is_stale(entry)]
+
+        if stale_keys:
+            BackgroundRefresh.schedule(stale_keys, lambda keys: cls.store_player_summaries(
+                SteamAPI.get_player_summaries_batched([ids_by_key[key] for key in keys])))
+
+        if missing_ids:
+            try:
+                rows_by_id.update(cls.store_player_summaries(SteamAPI.get_player_summaries_batched(missing_ids)))
+            except SteamAPIRateLimited:
+                if not allow_partial:
+                    raise
+
+        return [unpack(rows_by_id[steam_id], PROFILE_FIELDS) for steam_id in steam_ids if steam_id in rows_by_id]
+
+    @classmethod
+    def store_player_summaries(cls, players):
+        ''' Cache each GetPlayerSummaries player dict under its own steam_id, so summaries
+            fetched for any reason (login, friend list, id validation) are shared by all users.
+            @param list players: player dicts from a GetPlayerSummaries response
+            @return dict of packed rows keyed by steam_id
+        '''
+        rows_by_id = {player['steamid']: pack(player, PROFILE_FIELDS) for player in players}
+        cache.set_many({cls._key(steam_id, cls.PROFILE): cls._entry(row) for steam_id, row in rows_by_id.items()},
+                       settings.STEAM_CACHE_HARD_TTL)
+
+        return rows_by_id
+
+    ########## Games owned ##########
+
+    @classmethod
+    def get_games_owned(cls, steam_id):
+        ''' Return list of owned game dicts for steam_id or None if unavailable.
+            Only app ids and playtimes are cached per user; app info is joined from the
+            shared game catalog.
+        '''
+        rows = cls._get_or_fetch(cls._key(steam_id, cls.GAMES_OWNED), cls.GAMES_OWNED,
+                                 lambda: cls._fetch_games_owned(steam_id))
+
+        if rows is None:
+            return None
+
+        return cls._join_app_info(rows, lambda: cls._fetch_app_info(steam_id))
+
+    @classmethod
+    def fetch_games_owned(cls, steam_id):
+        ''' Request games owned from Steam, bypassing cached data, cache the result and return
+            list of game dicts with OWNED_GAME_FIELDS only (no app info), or None if unavailable.
+            For batch jobs that need current playtimes (see snapshot_playtime.py).
+        '''
+        rows = cls._fetch_and_set(cls._key(steam_id, cls.GAMES_OWNED), cls.GAMES_OWNED,
+                                  lambda: cls._fetch_games_owned(steam_id))
+
+        return [unpack(row, OWNED_GAME_FIELDS) for row in rows] if rows is not None else None
+
+    @staticmethod
+    def _join_app_info(rows, refill_func):
+        ''' Return list of game dicts (see GAME_FIELDS) for rows packed by OWNED_GAME_FIELDS,
+            with app info from the game catalog
+            @param refill_func: callable returning app info rows keyed by app_id, called if
+            some apps are missing from the catalog (e.g. entries expired or were evicted)
+        '''
+        app_ids = [row[0] for row in rows]
+        app_rows = GameCatalog.get_many(app_ids)
+
+        if len(app_rows) < len(set(app_ids)):
+            app_rows.update(refill_func())
+
+        empty_app_row = (None,) * (len(GAME_FIELDS) - len(OWNED_GAME_FIELDS))
+        return [unpack((app_id,) + app_rows.get(app_id, empty_app_row) + row[1:], GAME_FIELDS)
+                for app_id, row in zip(app_ids, rows)]
+
+    @classmethod
+    def cached_app_ids(cls, steam_id):
+        ''' Return list of app_ids in steam_id's cached games owned, without requesting
+            anything from Steam (empty if not cached)
+        '''
+        entry = cache.get(cls._key(steam_id, cls.GAMES_OWNED))
+        return [row[0] for row in entry[1]] if entry else []
+
+    @classmethod
+    def _fetch_games_owned(cls, steam_id):
+        ''' Request games owned and return packed rows or None if unavailable.
+            App info is requested along with games if the player's library isn't cached yet,
+            or some of its apps aren't in the game catalog, so a library is fetched with one
+            call. Apps missing from the catalog are otherwise filled in when read (see
+            _join_app_info), e.g. if games were added since the library was last cached.
+        '''
+        cached_app_ids = cls.cached_app_ids(steam_id)
+        include_appinfo = not cached_app_ids or len(GameCatalog.get_many(cached_app_ids)) < len(set(cached_app_ids))
+
+        response = SteamAPI.get_owned_games(steam_id, include_appinfo=int(include_appinfo))
+
+        if not response:
+            return None
+
+        games = response.json().get('response', {}).get('games', [])
+
+        if include_appinfo:
+            GameCatalog.store(games)
+
+        return [pack(game, OWNED_GAME_FIELDS) for game in games]
+
+    @staticmethod
+    def _fetch_app_info(steam_id):
+        ''' Request games owned with app info, add it to the game catalog and return
+            dict of app info rows keyed by app_id
+        '''
+        response = SteamAPI.get_owned_games(steam_id, include_appinfo=1)
+
+        if not response:
+            return {}
+
+        return GameCatalog.store(response.json().get('response', {}).get('games', []))
+
+    ########## Recently played games ##########
+
+    @classmethod
+    def get_recently_played(cls, steam_id):
+        ''' Return list of game dicts played by steam_id in the last two weeks, or None if
+            unavailable. Much smaller than games owned, and cached with shorter TTLs, so
+            recent activity stays current without refetching the whole library.
+        '''
+        rows = cls._get_or_fetch(cls._key(steam_id, cls.RECENTLY_PLAYED), cls.RECENTLY_PLAYED,
+                                 lambda: cls._fetch_recently_played(steam_id))
+
+        if rows is None:
+            return None
+
+        return cls._join_app_info(rows, lambda: cls._fetch_recently_played(steam_id, app_info_only=True))
+
+    @staticmethod
+    def _fetch_recently_played(steam_id, app_info_only=False):
+        ''' Request recently played games, add their app info to the game catalog, and return
+            packed rows or None if unavailable
+            @param bool app_info_only: return the app info rows keyed by app_id instead
+        '''
+        response = SteamAPI.get_recently_played_games(steam_id)
+
+        if not response:
+            return {} if app_info_only else None
+
+        games = response.json().get('response', {}).get('games', [])
+        app_rows = GameCatalog.store(games)
+
+        return app_rows if app_info_only else [pack(game, OWNED_GAME_FIELDS) for game in games]
+
+    ########## Achievement progress ##########
+
+    @classmethod
+    def get_achievement_progress(cls, steam_id):
+        ''' Return dict of achievement progress rows keyed by app_id (see achievements.py),
+            or None if none has been stored for steam_id
+        '''
+        entry = cache.get(cls._key(steam_id, cls.ACHIEVEMENT_PROGRESS))
+        return dict(entry[1]) if entry else None
+
+    @classmethod
+    def store_achievement_progress(cls, steam_id, progress):
+        ''' Cache achievement progress rows for steam_id. Progress is built up incrementally
+            and expensive to rebuild, so it's kept for STEAM_ACHIEVEMENT_PROGRESS_TTL.
+        '''
+        cache.set(cls._key(steam_id, cls.ACHIEVEMENT_PROGRESS), cls._entry(progress),
+                  cls._ttls(cls.ACHIEVEMENT_PROGRESS)[1])
+
+    ########## Friends ##########
+
+    @classmethod
+    def get_friend_list(cls, steam_id):
+        ''' Return list of friend player summary dicts for steam_id or None if unavailable.
+            Only the friend ids are cached per user; summaries come from the shared
+            per-player cache, with one batched request for any not yet cached.
+            If rate limited, friends without a cached summary are left out.
+        '''
+        friend_ids = cls.get_friend_ids(steam_id)
+
+        if friend_ids is None:
+            return None
+
+        return cls.get_player_summaries(friend_ids, allow_partial=True)
+
+    @classmethod
+    def get_friend_ids(cls, steam_id):
+        ''' Return list of steam_ids of a player's friends or None if unavailable '''
+        return cls._get_or_fetch(cls._key(steam_id, cls.FRIEND_IDS), cls.FRIEND_IDS,
+                                 lambda: cls._fetch_friend_ids(steam_id))
+
+    @staticmethod
+    def _fetch_friend_ids(steam_id):
+        ''' Request friend list and return friend steam_ids or None if unavailable '''
+        friend_ids_response = SteamAPI.get_friend_list(steam_id)
+
+        if not friend_ids_response:
+            return None
+
+        friends = friend_ids_response.json().get('friendslist', {}).get('friends', [])
+        return [friend['steamid'] for friend in friends]
+
+    ########## Pre-warming ##########
+
+    @classmethod
+    def keys_to_refresh(cls, steam_id, within=0):
+        ''' Return cache keys of steam_id's profile, games owned, recently played games, and
+            friend ids that are missing, or will be stale within the given number of seconds
+        '''
+        keys_by_name = {value_name: cls._key(steam_id, value_name)
+                        for value_name in (cls.PROFILE, cls.GAMES_OWNED, cls.RECENTLY_PLAYED, cls.FRIEND_IDS)}
+        entries = cache.get_many(list(keys_by_name.values()))
+
+        return [key for value_name, key in keys_by_name.items()
+                if key not in entries or entries[key][0] < time.time() + within - cls._ttls(value_name)[0]]
+
+    @classmethod
+    def refresh(cls, steam_id, within=0):
+        ''' Refetch steam_id's cached data that's missing or will be stale within the given
+            number of seconds, and summaries of the first page of friends not yet cached.
+            Only the summary is refreshed for private profiles. Keys being refreshed by
+            another worker are skipped.
+            @return list of cache keys refreshed
+        '''
+        cache_keys = BackgroundRefresh.acquire(cls.keys_to_refresh(steam_id, within))
+
+        try:
+            if cls._key(steam_id, cls.PROFILE) in cache_keys:
+                cls.store_player_summaries(SteamAPI.get_player_summaries_batched([steam_id]))
+
+            profile = cls.get_profile(steam_id)
+            if not profile or profile['communityvisibilitystate'] != SteamAPI.COMMUNITY_VISIBILITY_STATE_PUBLIC:
+                return cache_keys
+
+            games_owned_key = cls._key(steam_id, cls.GAMES_OWNED)
+            if games_owned_key in cache_keys:
+                cls._fetch_and_set(games_owned_key, cls.GAMES_OWNED, lambda: cls._fetch_games_owned(steam_id))
+
+            recently_played_key = cls._key(steam_id, cls.RECENTLY_PLAYED)
+            if recently_played_key in cache_keys:
+                cls._fetch_and_set(recently_played_key, cls.RECENTLY_PLAYED,
+                                   lambda: cls._fetch_recently_played(steam_id))
+
+            friend_ids_key = cls._key(steam_id, cls.FRIEND_IDS)
+            if friend_ids_key in cache_keys:
+                cls._fetch_and_set(friend_ids_key, cls.FRIEND_IDS, lambda: cls._fetch_friend_ids(steam_id))
+
+            friend_ids = cls.get_friend_ids(steam_id) or []
+            cls.get_player_summaries(friend_ids[:settings.STEAM_FRIEND_PAGE_SIZE], allow_partial=True)
+        finally:
+            BackgroundRefresh.release(cache_keys)
+
+        return cache_keys
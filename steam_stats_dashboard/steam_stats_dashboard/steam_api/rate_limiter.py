@@ -0,0 +1,159 @@
+'''
+Rate limiter module
+
+Limits how fast Steam API calls spend the STEAM_API_KEY quota. Each interface has its
+own token bucket (settings.STEAM_API_RATE_LIMITS), shared by all threads in the process.
+Callers wait up to settings.STEAM_API_RATE_LIMIT_MAX_WAIT seconds for a token before the
+call is refused. Calls made per day are counted in the cache, so the daily quota
+(settings.STEAM_API_DAILY_QUOTA) is shared by all processes using it.
+'''
+from collections import Counter
+import datetime
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ..helpers.cache_helper import CacheKey, build_key
+
+class TokenBucket:
+    ''' Token bucket refilled at rate tokens per second, holding at most capacity tokens '''
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def tokens_available(self):
+        ''' Return number of whole tokens currently available '''
+        with self._lock:
+            self._refill()
+            return int(self._tokens)
+
+    def acquire(self, max_wait=0):
+        ''' Take one token, waiting up to max_wait seconds for one to become available
+            @return True if a token was taken, False if none was available in time
+        '''
+        deadline = time.monotonic() + max_wait
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+class RateLimiter:
+    ''' Per-interface token buckets, daily quota, and call counters for the Steam API key '''
+
+    DEFAULT = 'default'
+
+    _buckets = {}
+    _counters = Counter()
+    _lock = threading.Lock()
+
+    @classmethod
+    def _bucket(cls, interface):
+        if interface not in cls._buckets:
+            with cls._lock:
+                if interface not in cls._buckets:
+                    limits = settings.STEAM_API_RATE_LIMITS
+                    rate, capacity = limits.get(interface, limits[cls.DEFAULT])
+                    cls._buckets[interface] = TokenBucket(rate, capacity)
+
+        return cls._buckets[interface]
+
+    @staticmethod
+    def _daily_key():
+        return build_key(CacheKey.STEAM_API, datetime.date.today().isoformat(), 'calls')
+
+    @classmethod
+    def _count(cls, interface, counter_name):
+        with cls._lock:
+            cls._counters[(interface, counter_name)] += 1
+
+    @classmethod
+    def daily_calls(cls):
+        ''' Return number of calls made today, across all processes sharing the cache '''
+        return cache.get(cls._daily_key(), 0)
+
+    @classmethod
+    def batch_quota_available(cls):
+        ''' Return True if batch jobs (e.g. pre-warming) may still make calls today, leaving
+            STEAM_API_BATCH_QUOTA_RESERVE of the daily quota for interactive requests
+        '''
+        return settings.STEAM_API_DAILY_QUOTA - cls.daily_calls() \
+            > settings.STEAM_API_DAILY_QUOTA * settings.STEAM_API_BATCH_QUOTA_RESERVE
+
+    @classmethod
+    def retry_after(cls):
+        ''' Return seconds callers refused a call should wait before retrying: until the
+            daily quota resets if it's spent, otherwise STEAM_API_RETRY_AFTER
+        '''
+        if cls.daily_calls() >= settings.STEAM_API_DAILY_QUOTA:
+            now = datetime.datetime.now()
+            midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+            return int((midnight - now).total_seconds()) + 1
+
+        return settings.STEAM_API_RETRY_AFTER
+
+    @classmethod
+    def acquire(cls, interface):
+        ''' Reserve one call for interface, waiting briefly if its budget is spent.
+            @return True if the call may be made, False if it's throttled
+        '''
+        if cls.daily_calls() >= settings.STEAM_API_DAILY_QUOTA \
+                or not cls._bucket(interface).acquire(settings.STEAM_API_RATE_LIMIT_MAX_WAIT):
+            cls._count(interface, 'calls_throttled')
+            return False
+
+        daily_key = cls._daily_key()
+        # Expire a little after midnight, in case the last call of the day lands late
+        cache.add(daily_key, 0, datetime.timedelta(days=1, hours=1).total_seconds())
+        try:
+            cache.incr(daily_key)
+        except ValueError:
+            # Key expired between add and incr
+            cache.set(daily_key, 1, datetime.timedelta(days=1, hours=1).total_seconds())
+
+        cls._count(interface, 'calls_made')
+        return True
+
+    @classmethod
+    def stats(cls):
+        ''' Return dict of call counters for this process, and remaining budgets '''
+        daily_calls = cls.daily_calls()
+
+        with cls._lock:
+            interfaces = {interface for interface, counter_name in cls._counters} | set(cls._buckets)
+            counters = dict(cls._counters)
+
+        return {
+            'calls_made': sum(count for (_, name), count in counters.items() if name == 'calls_made'),
+            'calls_throttled': sum(count for (_, name), count in counters.items() if name == 'calls_throttled'),
+            'daily_quota': settings.STEAM_API_DAILY_QUOTA,
+            'daily_calls': daily_calls,
+            'daily_remaining': max(settings.STEAM_API_DAILY_QUOTA - daily_calls, 0),
+            'interfaces': {
+                interface: {
+                    'calls_made': counters.get((interface, 'calls_made'), 0),
+                    'calls_throttled': counters.get((interface, 'calls_throttled'), 0),
+                    'tokens_available': cls._bucket(interface).tokens_available,
+                }
+                for interface in interfaces
+            },
+        }
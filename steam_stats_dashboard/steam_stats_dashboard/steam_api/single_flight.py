@@ -0,0 +1,117 @@
+'''
+Single-flight module
+
+Coalesces concurrent identical Steam API calls: while a call for a given key is in
+flight, other callers for the same key wait for it and share its result instead of
+making their own request.
+
+Within a process this is done with a per-key threading.Event. If
+settings.STEAM_API_SINGLE_FLIGHT_CROSS_PROCESS is True, the leading call also takes a
+lock in the shared cache and publishes its result there briefly, so callers in other
+processes can wait on it too. Results are published in a compact form given by the
+caller (e.g. status and body rather than a whole requests.Response), and rebuilt by
+the processes waiting on them.
+'''
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ..helpers.cache_helper import CacheKey, build_key
+
+# Cached in place of a None result, since cache.get returns None for a miss
+_NONE_RESULT = 'single_flight:none'
+
+class _Call:
+    ''' An in-flight call, shared by the leading caller and any waiting callers '''
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    ''' Runs at most one call per key at a time, sharing its result with concurrent callers '''
+
+    POLL_INTERVAL = 0.05 # seconds between checks for another process' result
+
+    _calls = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def build_call_key(*parts):
+        ''' Return hashable key for call parts. Dicts are included as sorted items. '''
+        return tuple(tuple(sorted(part.items())) if isinstance(part, dict) else part for part in parts)
+
+    @classmethod
+    def do(cls, call_key, func, encode=None, decode=None):
+        ''' Return func(), or the result of an identical call already in flight.
+            Exceptions raised by the leading call are raised for all callers.
+            @param encode: callable returning the picklable form of a result published to other
+            processes, and decode the callable rebuilding a result from it. Results are
+            published as is by default.
+        '''
+        with cls._lock:
+            call = cls._calls.get(call_key)
+            is_leader = call is None
+            if is_leader:
+                call = cls._calls[call_key] = _Call()
+
+        if not is_leader:
+            call.done.wait()
+            if call.error:
+                raise call.error
+            return call.result
+
+        try:
+            if settings.STEAM_API_SINGLE_FLIGHT_CROSS_PROCESS:
+                call.result = cls._do_shared(call_key, func, encode, decode)
+            else:
+                call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with cls._lock:
+                del cls._calls[call_key]
+            call.done.set()
+
+        return call.result
+
+    @staticmethod
+    def _shared_keys(call_key):
+        ''' Return (lock key, result key) in the shared cache for call_key '''
+        key_hash = hashlib.sha1(repr(call_key).encode('utf-8')).hexdigest()
+        return (build_key(CacheKey.STEAM_API, key_hash, 'lock'), build_key(CacheKey.STEAM_API, key_hash, 'result'))
+
+    @classmethod
+    def _do_shared(cls, call_key, func, encode=None, decode=None):
+        ''' Run func under a cache lock shared by all processes, or wait for the result of
+            the process holding it. Falls back to calling func if no result arrives in time.
+        '''
+        lock_key, result_key = cls._shared_keys(call_key)
+
+        if cache.add(lock_key, True, settings.STEAM_API_SINGLE_FLIGHT_WAIT):
+            try:
+                result = func()
+                published = result if result is None or encode is None else encode(result)
+                cache.set(result_key, _NONE_RESULT if published is None else published,
+                          settings.STEAM_API_SINGLE_FLIGHT_RESULT_TTL)
+                return result
+            finally:
+                cache.delete(lock_key)
+
+        wait_until = time.time() + settings.STEAM_API_SINGLE_FLIGHT_WAIT
+        while time.time() < wait_until:
+            result = cache.get(result_key)
+            if result is not None:
+                if result == _NONE_RESULT:
+                    return None
+                return result if decode is None else decode(result)
+            if cache.get(lock_key) is None:
+                # Leader finished (or failed) without publishing a result
+                break
+            time.sleep(cls.POLL_INTERVAL)
+
+        return func()
@@ -4,12 +4,20 @@ Steam API wrapper module
 Steam API request format: http://api.steampowered.com/<interface>/<method>/<method_version>?<params>
 API documentation: http://steamwebapi.azurewebsites.net
 '''
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
 import json
+import threading
+import time
 
 import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 
 from .constants import Interfaces as i, Methods as m, Version as v
+from .rate_limiter import RateLimiter
+from .single_flight import SingleFlight
+from ..helpers.instrumentation import Instrumentation
 
 
 class SteamAPIError(Exception):
@@ -22,13 +30,78 @@ class SteamAPIInvalidResponse(SteamAPIError):
 class SteamAPIInvalidUserError(SteamAPIError):
     pass
 
+class SteamAPIConnectionError(SteamAPIError):
+    ''' Raised when Steam API can't be reached, or a request times out '''
+    pass
+
+class SteamAPIRateLimited(SteamAPIError):
+    ''' Raised when a call would exceed the API key's rate limit or daily quota '''
+    pass
+
+class SteamAPISession:
+    ''' Per-process pooled requests.Session used for all Steam API calls.
+        Connections to api.steampowered.com are kept alive and reused across requests,
+        and failed requests (5xx, 429) are retried with exponential backoff.
+    '''
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+    _session = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_session(cls):
+        ''' Return the shared session, creating it on first use '''
+        if cls._session is None:
+            with cls._lock:
+                if cls._session is None:
+                    cls._session = cls._create_session()
+
+        return cls._session
+
+    @classmethod
+    def _create_session(cls):
+        ''' Build session with a retrying, pooled adapter mounted for http and https '''
+        retry = Retry(
+            total=settings.STEAM_API_MAX_RETRIES,
+            backoff_factor=settings.STEAM_API_RETRY_BACKOFF,
+            status_forcelist=cls.RETRY_STATUS_CODES,
+            raise_on_status=False, # Final bad response is handled by SteamAPI.get
+        )
+        adapter = HTTPAdapter(
+            pool_connections=settings.STEAM_API_POOL_CONNECTIONS,
+            pool_maxsize=settings.STEAM_API_POOL_SIZE,
+            max_retries=retry,
+        )
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['Connection'] = 'keep-alive'
+
+        return session
+
+    @classmethod
+    def timeout(cls):
+        ''' Return (connect, read) timeout tuple in seconds '''
+        return (settings.STEAM_API_CONNECT_TIMEOUT, settings.STEAM_API_READ_TIMEOUT)
+
+    @classmethod
+    def close(cls):
+        ''' Close pooled connections. A new session is created on next use. '''
+        with cls._lock:
+            if cls._session is not None:
+                cls._session.close()
+                cls._session = None
+
 class SteamAPI:
-    BASE_URL = "http://api.steampowered.com"
+    # Point at a local stand-in (see fake_server.py) with settings.STEAM_API_BASE_URL
+    BASE_URL = settings.STEAM_API_BASE_URL
     # Interface, method, and version values for the relative url contained in constants.py
 
     NAME_SUCCESS_MATCH = 1
     NAME_NO_MATCH = 42
     COMMUNITY_VISIBILITY_STATE_PUBLIC = 3
+    PLAYER_SUMMARIES_MAX_IDS = 100
 
     @classmethod
     def _build_url(cls, interface, method, version):
@@ -47,14 +120,52 @@ class SteamAPI:
 
     @classmethod
     def get(cls, interface, method, version, params={}):
-        ''' Make a GET request to AppNexus API
+        ''' Make a GET request to Steam API. Concurrent identical requests are coalesced
+            into one (see single_flight.py).
             @param const interface
             @param const method
             @param const version
             @param dict params
             @return response if success, None if unauthorized request
         '''
-        response = requests.get(cls._build_url(interface, method, version), params=params)
+        call_key = SingleFlight.build_call_key(interface, method, version,
+                                               {k: val for k, val in params.items() if k != 'key'})
+        return SingleFlight.do(call_key, lambda: cls._get(interface, method, version, params),
+                               encode=cls._encode_response, decode=cls._decode_response)
+
+    @staticmethod
+    def _encode_response(response):
+        ''' Return (status code, url, body) of a response, shared with other processes
+            instead of the whole requests.Response (see single_flight.py)
+        '''
+        return (response.status_code, response.url, response.content)
+
+    @staticmethod
+    def _decode_response(encoded):
+        ''' Return requests.Response rebuilt from _encode_response output '''
+        response = requests.Response()
+        response.status_code, response.url, response._content = encoded
+        response.encoding = 'utf-8'
+        return response
+
+    @classmethod
+    def _get(cls, interface, method, version, params):
+        ''' Make the GET request for get
+            @raises SteamAPIRateLimited if no call budget is left for the interface
+        '''
+        if not RateLimiter.acquire(interface):
+            raise SteamAPIRateLimited("Rate limit reached. Interface: {}, method: {}".format(interface, method))
+
+        start = time.perf_counter()
+        try:
+            response = SteamAPISession.get_session().get(cls._build_url(interface, method, version),
+                                                         params=params, timeout=SteamAPISession.timeout())
+        except requests.exceptions.RequestException as e:
+            Instrumentation.record_upstream_call(interface, method, (time.perf_counter() - start) * 1000, 'error')
+            raise SteamAPIConnectionError("Request failed: {}".format(e))
+
+        Instrumentation.record_upstream_call(interface, method, (time.perf_counter() - start) * 1000,
+                                             response.status_code)
 
         if response.status_code == 200:
             return response
@@ -67,23 +178,56 @@ class SteamAPI:
     @classmethod
     def post(cls, interface, method, version, data={}):
         ''' Make a POST request to Steam API '''
-        return requests.post(cls._build_url(interface, method, version), data={})
+        try:
+            return SteamAPISession.get_session().post(cls._build_url(interface, method, version),
+                                                      data=data, timeout=SteamAPISession.timeout())
+        except requests.exceptions.RequestException as e:
+            raise SteamAPIConnectionError("Request failed: {}".format(e))
 
     #############  ISteamUser Interface ##################
 
     @classmethod
     def get_player_summaries(cls, steam_ids):
         ''' Get info for provided steam id(s)
-            @param list steam_ids: list of id64 steam ids to retrieve profile data (100 max per request)
+            @param list steam_ids: list of id64 steam ids to retrieve profile data (100 max per request,
+            use get_player_summaries_batched for longer lists)
         '''
         if isinstance(steam_ids, list) and len(steam_ids) > 0:
-
-            # TODO - paginate if more than 100 ids given
             steam_id_list = ",".join(steam_ids)
             return cls.get(i.ISTEAM_USER, m.GET_PLAYER_SUMMARIES, v.V2, cls._build_params_dict({'steamids': steam_id_list}))
         else:
             raise TypeError("Must provide valid list of Steam IDs")
 
+    @classmethod
+    def get_player_summaries_batched(cls, steam_ids):
+        ''' Get player summaries for any number of steam ids. Ids are split into chunks
+            of PLAYER_SUMMARIES_MAX_IDS, and chunks are requested concurrently.
+            @param list steam_ids: list of id64 steam ids
+            @return list of player summary dicts, in the order of steam_ids given.
+            Ids Steam doesn't return a summary for are omitted.
+        '''
+        if not isinstance(steam_ids, list):
+            raise TypeError("Must provide valid list of Steam IDs")
+
+        steam_ids = [str(steam_id) for steam_id in steam_ids]
+        chunks = [steam_ids[start:start + cls.PLAYER_SUMMARIES_MAX_IDS]
+                  for start in range(0, len(steam_ids), cls.PLAYER_SUMMARIES_MAX_IDS)]
+
+        if len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(chunks), settings.STEAM_API_BATCH_WORKERS)) as executor:
+                responses = list(executor.map(Instrumentation.bind(cls.get_player_summaries), chunks))
+        else:
+            responses = [cls.get_player_summaries(chunk) for chunk in chunks]
+
+        # Steam doesn't preserve request order within a chunk, so merge by id
+        players_by_id = {}
+        for response in responses:
+            if response:
+                for player in response.json()['response']['players']:
+                    players_by_id[player['steamid']] = player
+
+        return [players_by_id[steam_id] for steam_id in steam_ids if steam_id in players_by_id]
+
     @classmethod
     def get_friend_list(cls, steam_id):
         ''' Return list of friends for provided steam id '''
@@ -129,9 +273,49 @@ class SteamAPI:
         return cls.get(i.IPLAYER_SERVICE, m.GET_BADGES, v.V1, cls._build_params_dict({"steamid": steam_id}))
 
     #############  ISteamUserStats Interface  ##################
-    # Methods:
-    # GetGlobalAchievementPercentagesForApp
-    # GetGlobalStatsForGame
-    # GetNumberOfCurrentPlayers
-    # GetPlayerAchievements
+    # Methods not yet implemented:
     # GetUserStatsForGame
+
+    @classmethod
+    def get_player_achievements(cls, steam_id, app_id):
+        ''' Get a player's achievements for a game. Games without stats get a 400 response,
+            raised as SteamAPIInvalidResponse.
+            @param int steam_id
+            @param int app_id
+        '''
+        return cls.get(i.ISTEAM_USER_STATS, m.GET_PLAYER_ACHIEVEMENTS, v.V1, cls._build_params_dict({
+            'steamid': steam_id,
+            'appid': app_id,
+        }))
+
+    @classmethod
+    def get_schema_for_game(cls, app_id):
+        ''' Get the stats and achievements defined for a game
+            @param int app_id
+        '''
+        return cls.get(i.ISTEAM_USER_STATS, m.GET_SCHEMA_FOR_GAME, v.V2, cls._build_params_dict({'appid': app_id}))
+
+    @classmethod
+    def get_number_of_current_players(cls, app_id):
+        ''' Get the number of players currently in a game
+            @param int app_id
+        '''
+        return cls.get(i.ISTEAM_USER_STATS, m.GET_NUMBER_OF_CURRENT_PLAYERS, v.V1, cls._build_params_dict({'appid': app_id}))
+
+    @classmethod
+    def get_global_stats_for_game(cls, app_id, stat_names):
+        ''' Get totals of a game's aggregated stats across all players
+            @param int app_id
+            @param list stat_names: names of stats marked as aggregated by the game
+        '''
+        params = {'appid': app_id, 'count': len(stat_names)}
+        params.update(('name[{}]'.format(index), stat_name) for index, stat_name in enumerate(stat_names))
+        return cls.get(i.ISTEAM_USER_STATS, m.GET_GLOBAL_STATS_FOR_GAME, v.V1, cls._build_params_dict(params))
+
+    @classmethod
+    def get_global_achievement_percentages(cls, app_id):
+        ''' Get the percentage of players who have unlocked each of a game's achievements
+            @param int app_id
+        '''
+        return cls.get(i.ISTEAM_USER_STATS, m.GET_GLOBAL_ACHIEVEMENT_PERCENTAGES_FOR_APP, v.V2,
+                       cls._build_params_dict({'gameid': app_id}))
@@ -4,34 +4,57 @@ SteamUserProfile module:
 SteamUserProfile represents the profile (including games owned, friends, etc)
 for the logged in SteamUser (SteamUser.profile). It's populated from cache
 or Steam API directly, and not persisted to db, since only current data should be
-returned for dashboard.
+returned for dashboard. Playtime history is the exception, stored separately as
+periodic snapshots (see helpers/playtime_history.py).
+
+Games owned can be large, so they can be left to load on first access (load_games=False).
+Recent activity comes from the much smaller list of recently played games (recently_played),
+which is cached separately with shorter TTLs.
 
 If SteamUserProfile is instantiated with is_friend=True, it represents a user's friend
 and only basic profile info will be loaded.
 
+A player's friend_list is a lazy FriendList: friend ids are only requested when it's
+first used, and FriendProfile entries only load a friend's profile when accessed,
+a page of friends at a time (one batched GetPlayerSummaries request per page).
+
 Profile data can only be gathered from public profiles, which is indicated by
 communityvisibilitystate == 3). If public attribute is False, do not attempt
 to load games or friend list. Private users may be displayed as friends of other
 players, but display data is restricted to their personaname.
 '''
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import time
 
-from django.core.cache import cache
+from django.conf import settings
 
-from .game import Game
+from .game_library import GameLibrary
+from .lookup_index import LookupIndex
+from .profile_cache import ProfileCache
 from .steam_api import SteamAPI, SteamAPIInvalidUserError
-from ..helpers.cache_helper import CacheKey, build_key
+from ..helpers.instrumentation import Instrumentation
 
 class SteamUserProfile:
     ''' SteamUserProfile class, representing logged in SteamUser's profile or friend profile '''
 
-    def __init__(self, steam_id, is_friend=False):
+    def __init__(self, steam_id, is_friend=False, concurrent=None, load_friends=False, load_games=True):
+        ''' @param bool concurrent: fetch games and friends in parallel once the profile is
+            confirmed public. Defaults to settings.STEAM_PROFILE_CONCURRENT_LOAD
+            @param bool load_friends: also prefetch the first page of the friend list while
+            loading, instead of on first access
+            @param bool load_games: load games owned while loading, instead of on first access
+        '''
         self.steam_id = str(steam_id)
         self.public = False
         self.time_joined = None # Private profile only
 
-        self.games_owned = []
-        self.friend_list = []
+        self._games_owned = None
+        self._recently_played = None
+        self._friend_list = None
+
+        # Wall clock ms spent on each fetch during load_player_data, keyed by fetch name
+        self.load_timings = {}
 
         # User profile fields
         self._profile_url = None
@@ -43,7 +66,9 @@ class SteamUserProfile:
 
         # Only request data for friends as needed to prevent unnecessary API calls
         if not is_friend:
-            self.load_player_data()
+            if concurrent is None:
+                concurrent = settings.STEAM_PROFILE_CONCURRENT_LOAD
+            self.load_player_data(concurrent=concurrent, load_friends=load_friends, load_games=load_games)
 
     def __repr__(self):
         ''' String representation of SteamUserProfile object '''
@@ -60,84 +85,105 @@ class SteamUserProfile:
             'avatar': self._avatar,
             'avatar_medium': self._avatar_medium,
             'avatar_full': self._avatar_full,
-            'time_joined': datetime.fromtimestamp(self.time_joined),
+            'time_joined': datetime.fromtimestamp(self.time_joined) if self.time_joined else None,
         }
 
-    def load_player_data(self):
-        ''' Fetches profile, game, and friend data for the player, and populates the profile '''
-        profile_json = self.get_profile_json()
+    @property
+    def games_owned(self):
+        ''' Return player's games owned GameLibrary, loading it on first access if public '''
+        if self._games_owned is None:
+            self.load_games_owned(self.get_games_owned_json() if self.public else None)
+        return self._games_owned
+
+    @property
+    def recently_played(self):
+        ''' Return GameLibrary of games played in the last two weeks, loaded on first access
+            if public. Recent activity panels use this instead of the much larger games owned.
+        '''
+        if self._recently_played is None:
+            self.load_recently_played(self.get_recently_played_json() if self.public else None)
+        return self._recently_played
+
+    @property
+    def friend_list(self):
+        ''' Return player's FriendList. Nothing is requested until it's used. '''
+        if self._friend_list is None:
+            self._friend_list = FriendList(self.steam_id)
+        return self._friend_list
+
+    def load_player_data(self, concurrent=False, load_friends=False, load_games=True):
+        ''' Fetches profile and game data for the player, and populates the profile.
+            @raises SteamAPIInvalidUserError if Steam doesn't return a summary for steam_id
+            @param bool concurrent: if True, request games owned and friend list at the same time
+            (the profile itself must be fetched first to know whether it's public)
+            @param bool load_friends: if True, also prefetch the first page of friends
+            @param bool load_games: if False, games owned are only loaded on first access
+        '''
+        load_start = time.perf_counter()
+
+        profile_json = self._timed('profile', self.get_profile_json)
+        if profile_json is None:
+            raise SteamAPIInvalidUserError("No player summary for steam id: {}".format(self.steam_id))
         self.load_profile(profile_json)
 
         # Get games and friend data if public profile
         if profile_json['communityvisibilitystate'] == SteamAPI.COMMUNITY_VISIBILITY_STATE_PUBLIC:
-            games_owned_json = self.get_games_owned_json()
-            self.load_games_owned(games_owned_json)
-
-            friend_list_json = self.get_friend_list_json()
-            self.load_friend_list(friend_list_json)
+            fetches = []
+            if load_games:
+                fetches.append(('games_owned', self.get_games_owned_json))
+            if load_friends:
+                fetches.append(('friend_list', lambda: self.friend_list.prefetch(0, settings.STEAM_FRIEND_PAGE_SIZE)))
+
+            if concurrent and len(fetches) > 1:
+                with ThreadPoolExecutor(max_workers=len(fetches)) as executor:
+                    futures = [executor.submit(Instrumentation.bind(self._timed), fetch_name, fetch_func)
+                               for fetch_name, fetch_func in fetches]
+                    results = [future.result() for future in futures]
+            else:
+                results = [self._timed(fetch_name, fetch_func) for fetch_name, fetch_func in fetches]
+
+            if load_games:
+                self.load_games_owned(results[0])
+
+        self.load_timings['total'] = (time.perf_counter() - load_start) * 1000
+
+    def _timed(self, fetch_name, fetch_func):
+        ''' Call fetch_func, record its duration in ms under fetch_name in self.load_timings
+            and return its result
+        '''
+        start = time.perf_counter()
+        try:
+            return fetch_func()
+        finally:
+            self.load_timings[fetch_name] = (time.perf_counter() - start) * 1000
 
     ########## Get player data ##########
     def get_profile_json(self):
         ''' Return player's profile JSON data or None '''
-        cache_key = build_key(CacheKey.USER, self.steam_id, 'profile_data')
-        response = cache.get(cache_key)
-
-        if not response:
-            response = SteamAPI.get_player_summaries([self.steam_id])
-            cache.set(cache_key, response)
-
-        try:
-            return response.json()['response']['players'][0]
-        except IndexError:
-            return None
+        return ProfileCache.get_profile(self.steam_id)
 
     def get_games_owned_json(self):
         ''' Return list of games owned by player or None '''
-        cache_key = build_key(CacheKey.USER, self.steam_id, 'games_owned')
-        response = cache.get(cache_key)
-
-        if not response:
-            response = SteamAPI.get_owned_games(self.steam_id)
-            cache.set(cache_key, response)
+        return ProfileCache.get_games_owned(self.steam_id)
 
-        return response.json().get('response').get('games')
+    def get_recently_played_json(self):
+        ''' Return list of games played by player in the last two weeks or None '''
+        return ProfileCache.get_recently_played(self.steam_id)
 
     def get_friend_list_json(self):
-        ''' Return list of friend profiles for current player or None.
-            If not in cache, this requires two requests:
-            (1) get steam_ids for a player's friends.
-            (2) request profile info for those ids.
-        '''
-        cache_key = build_key(CacheKey.USER, self.steam_id, 'friend_list')
-
-        friend_profiles_response = cache.get(cache_key)
-
-        if not friend_profiles_response:
-            friend_ids = []
-
-            # First, get list of user's friends' Steam ids
-            friend_ids_response = SteamAPI.get_friend_list(self.steam_id)
-
-            if not friend_ids_response:
-                return None
-
-            for friend in friend_ids_response.json()['friendslist']['friends']:
-                friend_ids.append(friend['steamid'])
-
-            # Get basic profile info for each friend in friend_ids list.
-            # Note: 100 ids max per request
-            # TODO: implement multiple request pagination
-            friend_profiles_response = SteamAPI.get_player_summaries(friend_ids).json().get('response').get('players')
-            cache.set(cache_key, friend_profiles_response)
-
-        return friend_profiles_response
+        ''' Return list of friend profiles for current player or None '''
+        return ProfileCache.get_friend_list(self.steam_id)
 
     ########## Populate SteamUserProfile Methods ##########
 
     def load_profile(self, profile_data):
         ''' Load player profile data attributes by parsing given profile_data dict.
             Set public profile attribute based on 'communityvisibilitystate' value.
+            The profile is left empty (and private) if profile_data is None.
         '''
+        if profile_data is None:
+            return
+
         if profile_data['communityvisibilitystate'] == SteamAPI.COMMUNITY_VISIBILITY_STATE_PUBLIC:
             self.public = True
             self.time_joined = profile_data.get('timecreated')
@@ -150,65 +196,131 @@ class SteamUserProfile:
 
     def load_games_owned(self, games_owned):
         ''' Load list of games owned by player into self.games_owned '''
-        if len(games_owned) > 0:
-            for game in games_owned:
-                # Calculate two week playtime mins and create player Game objects
-                playtime_mins_two_weeks = game['playtime_2weeks'] if 'playtime_2weeks' in game else 0
-                self.games_owned.append(Game(game, playtime_mins_two_weeks))
-
-    def load_friend_list(self, friend_list_data):
-        ''' Populate self.friend_list list with player's friends.
-            Ensure that is_friend=True when instantiating friend Player objects
-            to defer loading their full profile info until needed.
-        '''
-        if len(friend_list_data) > 0:
-            for friend_profile_dict in friend_list_data:
-                friend = SteamUserProfile(friend_profile_dict['steamid'], is_friend=True)
+        self._games_owned = GameLibrary(games_owned)
 
-                # Now that empty friend object is created, populate its profile
-                friend.load_profile(friend_profile_dict)
-                self.friend_list.append(friend)
+    def load_recently_played(self, recently_played):
+        ''' Load list of games played in the last two weeks into self.recently_played '''
+        self._recently_played = GameLibrary(recently_played)
 
     ########## Game Collection ##########
 
     @property
     def games_played(self):
         ''' Return list of player's games that have been played for one or more minutes '''
-        return [game for game in self.games_owned if game.playtime_mins >= 1]
+        return self.games_owned.stats.played_and_unplayed(played_mins_threshold=1)[0]
 
     @property
     def games_unplayed(self):
         ''' Return list of games that have never been played (0 mins) '''
-        return [game for game in self.games_owned if game.playtime_mins == 0]
+        return self.games_owned.stats.played_and_unplayed(played_mins_threshold=1)[1]
 
     ########## Profile validation (non-auth) methods ##########
 
     def validate_user_input_steam_id(self):
-        ''' Validate the user-provided 64 bit steam_id (instance attribute) is valid
+        ''' Validate the user-provided 64 bit steam_id (instance attribute) is valid.
             @raises SteamAPIInvalidUserError if unable to validate user name given
         '''
-        response = SteamAPI.get_player_summaries([self.steam_id])
+        return self.validate_steam_id(self.steam_id)
 
-        try:
-            steam_id = response.json()['response']['players'][0]['steamid']
-        except (KeyError, TypeError) as e:
-            raise SteamAPIInvalidUserError("Could not validate user-input steam id: {}".format(e))
+    @staticmethod
+    def validate_steam_id(steam_id):
+        ''' Validate a 64 bit steam_id without loading the player's profile. Results are
+            cached (see lookup_index.py), as is the player summary fetched to validate.
+            @raises SteamAPIInvalidUserError if unable to validate steam id given
+        '''
+        if not LookupIndex.is_valid_steam_id(steam_id):
+            raise SteamAPIInvalidUserError("Could not validate user-input steam id: {}".format(steam_id))
 
-        return steam_id
+        return str(steam_id)
 
     @staticmethod
     def get_steam_id_from_vanity_url_name(input_user_name):
-        ''' Get user's SteamID64 from vanity url name
+        ''' Get user's SteamID64 from vanity url name. Results, including no match, are cached
+            (see lookup_index.py).
             @param str input_user_name: the vantiy user name associated with the user account
             @return steam_id or None
+        '''
+        return LookupIndex.resolve_vanity_name(input_user_name)
+
+class FriendProfile:
+    ''' Proxy for a friend's SteamUserProfile. Attribute access loads the friend's profile,
+        along with the rest of its page in the friend list, if not already loaded.
+    '''
+
+    def __init__(self, steam_id, friend_list, index):
+        self.steam_id = steam_id
+        self._friend_list = friend_list
+        self._index = index
+        self._profile = None
+
+    def __repr__(self):
+        return "<FriendProfile> steam_id: {0}, loaded: {1}".format(self.steam_id, self._profile is not None)
+
+    def __getattr__(self, name):
+        # Only called for attributes not set in __init__. Private names aren't proxied,
+        # so copying/pickling a proxy doesn't trigger a load.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.profile, name)
+
+    @property
+    def is_loaded(self):
+        return self._profile is not None
+
+    @property
+    def profile(self):
+        ''' Return the friend's SteamUserProfile, loading its page of friends if needed '''
+        if self._profile is None:
+            page_size = settings.STEAM_FRIEND_PAGE_SIZE
+            self._friend_list.prefetch(self._index - self._index % page_size, page_size)
+        return self._profile
+
+    def load(self, profile_data):
+        ''' Populate the proxied profile from a player summary dict, or leave it empty if None '''
+        profile = SteamUserProfile(self.steam_id, is_friend=True)
+        if profile_data:
+            profile.load_profile(profile_data)
+        self._profile = profile
+
+class FriendList:
+    ''' Lazy list of a player's friends, as FriendProfile proxies '''
+
+    def __init__(self, steam_id):
+        self.steam_id = steam_id
+        self._friends = None
+
+    def _get_friends(self):
+        if self._friends is None:
+            friend_ids = ProfileCache.get_friend_ids(self.steam_id) or []
+            self._friends = [FriendProfile(friend_id, self, index) for index, friend_id in enumerate(friend_ids)]
+        return self._friends
+
+    def __len__(self):
+        return len(self._get_friends())
+
+    def __iter__(self):
+        return iter(self._get_friends())
+
+    def __getitem__(self, index):
+        return self._get_friends()[index]
+
+    def __repr__(self):
+        return "<FriendList> steam_id: {0}".format(self.steam_id)
 
-            invalid response: {'response': {'message': 'No match', 'success': 42}}
-            valid response: { "response": { "steamid": "76561197969470540", "success": 1 } }
+    def prefetch(self, start=0, count=None):
+        ''' Load profiles for friends in [start, start + count) with one batched request
+            for those not already loaded. Friends missing a summary (e.g. if rate limited)
+            are loaded with empty profile data.
+            @return list of FriendProfile for the page
         '''
-        steam_id = None
-        response = SteamAPI.resolve_vanity_url(input_user_name).json()['response']
+        friends = self._get_friends()
+        page = friends[start:] if count is None else friends[start:start + count]
+        to_load = [friend for friend in page if not friend.is_loaded]
 
-        if response.get('success') == SteamAPI.NAME_SUCCESS_MATCH and response.get('steamid'):
-            steam_id = response.get('steamid')
+        if to_load:
+            summaries = ProfileCache.get_player_summaries([friend.steam_id for friend in to_load], allow_partial=True)
+            summaries_by_id = {summary['steamid']: summary for summary in summaries}
+            for friend in to_load:
+                friend.load(summaries_by_id.get(friend.steam_id))
 
-        return steam_id
+        return page
@@ -3,7 +3,7 @@ Unit tests for cache_helper module
 """
 from django.test import TestCase
 
-from steam_stats_dashboard.helpers.cache_helper import build_key
+from steam_stats_dashboard.helpers.cache_helper import build_key, build_versioned_key
 
 class TestCacheHelper(TestCase):
     """ Unit test class for cache_helper """
@@ -20,3 +20,13 @@ class TestCacheHelper(TestCase):
         # Verify expected key built when int id given
         test_key_2 = build_key('user', 1234567890, 'friend_list')
         self.assertEqual(test_key_2, 'user:1234567890:friend_list')
+
+    def test_build_versioned_key(self):
+
+        # Verify schema version appended to key
+        test_key_1 = build_versioned_key('user', self.steam_id, 'profile_data', version=2)
+        self.assertEqual(test_key_1, 'user:1234567890:profile_data:v2')
+
+        # Verify default version used when none given
+        test_key_2 = build_versioned_key('user', self.steam_id, 'profile_data')
+        self.assertTrue(test_key_2.startswith('user:1234567890:profile_data:v'))
@@ -0,0 +1,29 @@
+"""
+Unit tests for fragment_cache module
+"""
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from steam_stats_dashboard.helpers.fragment_cache import render_panel
+from steam_stats_dashboard.steam_api.steam_api import SteamAPIRateLimited
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestRenderPanel(TestCase):
+    """ Unit test class for render_panel """
+
+    def setUp(self):
+        cache.clear()
+        self.context = {'achievements': {'completion': {'unlocked': 3, 'total': 4}, 'games_pending': 0}}
+
+    def rate_limited(self):
+        raise SteamAPIRateLimited("Rate limit reached")
+
+    def test_fallback_when_steam_unavailable(self):
+        # Verify an unavailable panel is shown if nothing was rendered before
+        fragment = render_panel(None, '1', 'achievements', 'v1', self.rate_limited)
+        self.assertIn('panel-unavailable', fragment)
+
+        # Verify the latest fragment is shown once there is one, even for another data version
+        rendered = render_panel(None, '1', 'achievements', 'v1', lambda: self.context)
+        self.assertIn('Unlocked: 3 of 4', rendered)
+        self.assertEqual(render_panel(None, '1', 'achievements', 'v2', self.rate_limited), rendered)
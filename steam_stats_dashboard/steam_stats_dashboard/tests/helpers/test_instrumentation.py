@@ -0,0 +1,45 @@
+"""
+Unit tests for instrumentation module
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import TestCase
+
+from steam_stats_dashboard.helpers.instrumentation import Instrumentation
+
+class TestInstrumentation(TestCase):
+    """ Unit test class for Instrumentation """
+
+    def tearDown(self):
+        Instrumentation.end_request()
+
+    def test_request_totals(self):
+        request_metrics = Instrumentation.start_request()
+
+        Instrumentation.record_upstream_call('ISteamUser', 'GetPlayerSummaries', 12.5, 200)
+        Instrumentation.record_cache_lookup('games_owned', hits=3, misses=1)
+
+        # Verify calls made from worker threads are recorded when bound to the request
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(Instrumentation.bind(Instrumentation.record_upstream_call),
+                            'IPlayerService', 'GetOwnedGames', 7.5, 200).result()
+            executor.submit(Instrumentation.record_upstream_call, 'IPlayerService', 'GetOwnedGames', 5, 200).result()
+
+        self.assertIs(Instrumentation.end_request(), request_metrics)
+        self.assertEqual(request_metrics.upstream_calls, 2)
+        self.assertEqual(request_metrics.upstream_ms, 20)
+        self.assertEqual((request_metrics.cache_hits, request_metrics.cache_misses), (3, 1))
+        self.assertIn('steam;dur=20.0', request_metrics.server_timing())
+
+        # Verify nothing is recorded per request outside of a request
+        Instrumentation.record_upstream_call('ISteamUser', 'GetPlayerSummaries', 12.5, 200)
+        self.assertEqual(request_metrics.upstream_calls, 2)
+
+    def test_render_prometheus(self):
+        Instrumentation.observe('test_duration_ms', 30, step='collection')
+        metrics = Instrumentation.render_prometheus({'test_gauge': 5})
+
+        self.assertIn('# TYPE test_duration_ms histogram', metrics)
+        self.assertIn('test_duration_ms_bucket{step="collection",le="25"} 0', metrics)
+        self.assertIn('test_duration_ms_bucket{step="collection",le="50"} 1', metrics)
+        self.assertIn('test_gauge 5', metrics)
@@ -0,0 +1,73 @@
+"""
+Unit tests for json_api module
+"""
+import json
+
+from django.test import TestCase, override_settings
+
+from steam_stats_dashboard.helpers import json_api
+from steam_stats_dashboard.steam_api.game_library import GameLibrary
+from steam_stats_dashboard.steam_api.steam_api import SteamAPI
+from steam_stats_dashboard.steam_api.steam_user_profile import FriendList, FriendProfile
+
+class TestJsonAPI(TestCase):
+    """ Unit test class for json_api helpers """
+
+    def setUp(self):
+        self.library = GameLibrary([
+            {'appid': app_id, 'name': str(app_id), 'img_icon_url': '', 'img_logo_url': '',
+             'playtime_forever': app_id * 10, 'playtime_2weeks': 0}
+            for app_id in range(1, 8)
+        ])
+
+    def test_parse_fields(self):
+        self.assertEqual(json_api.parse_fields(None, json_api.LIBRARY_FIELDS), json_api.LIBRARY_FIELDS)
+        self.assertEqual(json_api.parse_fields('name, app_id', json_api.LIBRARY_FIELDS), ('name', 'app_id'))
+
+        with self.assertRaises(json_api.APIRequestError):
+            json_api.parse_fields('app_id,password', json_api.LIBRARY_FIELDS)
+
+    def test_cursor_pagination(self):
+        fields = ('app_id', 'playtime_mins')
+        offset, app_ids = 0, []
+
+        # Verify pages cover the library once, in order
+        while True:
+            page = json_api.page(json_api.library_records(self.library, fields, offset, offset + 3),
+                                 len(self.library), offset, 3, 'v1', 'games')
+            app_ids.extend(game['app_id'] for game in page['games'])
+            if page['next_cursor'] is None:
+                break
+            offset = json_api.decode_cursor(page['next_cursor'], 'v1')
+
+        self.assertEqual(app_ids, list(range(1, 8)))
+        self.assertEqual(page['games'][-1], {'app_id': 7, 'playtime_mins': 70})
+
+        # Verify cursors are rejected once the data changes, or if tampered with
+        cursor = json_api.encode_cursor(3, 'v1')
+        with self.assertRaises(json_api.APIRequestError) as context:
+            json_api.decode_cursor(cursor, 'v2')
+        self.assertEqual(context.exception.status, 409)
+
+        with self.assertRaises(json_api.APIRequestError):
+            json_api.decode_cursor('not a cursor', 'v1')
+
+    @override_settings(API_STREAM_CHUNK_SIZE=3)
+    def test_ndjson_stream(self):
+        chunks = list(json_api.ndjson_stream(json_api.library_records(self.library, ('app_id',), start=1)))
+
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual([json.loads(line) for line in "".join(chunks).splitlines()],
+                         [{'app_id': app_id} for app_id in range(2, 8)])
+
+    def test_friend_records_steam_unavailable(self):
+        friend_list = FriendList('76561197960265729')
+        friend_list._friends = [FriendProfile(str(76561197960265730 + index), friend_list, index) for index in range(3)]
+        base_url, SteamAPI.BASE_URL = SteamAPI.BASE_URL, 'http://127.0.0.1:1'
+
+        # Verify friends are streamed with empty profiles if Steam can't be reached
+        try:
+            records = list(json_api.friend_records(friend_list, ('steam_id', 'persona_name')))
+        finally:
+            SteamAPI.BASE_URL = base_url
+        self.assertEqual(records, [{'steam_id': friend.steam_id, 'persona_name': None} for friend in friend_list])
@@ -0,0 +1,35 @@
+"""
+Unit tests for library_ranking module
+"""
+from django.test import TestCase
+
+from steam_stats_dashboard.steam_api.game_library import GameLibrary
+
+class TestLibraryRanking(TestCase):
+    """ Unit test class for LibraryRanking """
+
+    def setUp(self):
+        playtimes = [(10, 600, 0), (20, 0, 0), (30, 900, 45), (40, 600, 90)]
+        self.library = GameLibrary([
+            {'appid': app_id, 'name': str(app_id), 'img_icon_url': '', 'img_logo_url': '',
+             'playtime_forever': playtime_mins, 'playtime_2weeks': playtime_mins_two_weeks}
+            for app_id, playtime_mins, playtime_mins_two_weeks in playtimes
+        ])
+        self.ranking = self.library.ranking
+
+    def test_top_games(self):
+
+        # Verify highest first, with ties kept in library order
+        self.assertEqual([game.app_id for game in self.ranking.top_games(3)], [30, 10, 40])
+        self.assertEqual([game.app_id for game in self.ranking.top_games(1, two_weeks=True)], [40])
+
+        # Verify ranking doesn't reorder the library
+        self.assertEqual([game.app_id for game in self.library], [10, 20, 30, 40])
+
+    def test_rank(self):
+        self.assertEqual(self.ranking.rank(30), 1)
+        self.assertEqual(self.ranking.rank(20), 4)
+        self.assertIsNone(self.ranking.rank(99))
+
+        # Verify top games from the sorted index match heap selection
+        self.assertEqual([game.app_id for game in self.ranking.top_games(3)], [30, 10, 40])
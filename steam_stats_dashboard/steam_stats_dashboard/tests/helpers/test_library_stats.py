@@ -0,0 +1,49 @@
+"""
+Unit tests for library_stats module
+"""
+from django.test import TestCase
+
+from steam_stats_dashboard.steam_api.game_library import GameLibrary
+
+class TestLibraryStats(TestCase):
+    """ Unit test class for LibraryStats """
+
+    def setUp(self):
+        playtimes = [(10, 600, 60), (20, 0, 0), (30, 45, 45), (40, 15, 0)]
+        self.library = GameLibrary([
+            {'appid': app_id, 'name': str(app_id), 'img_icon_url': '', 'img_logo_url': '',
+             'playtime_forever': playtime_mins, 'playtime_2weeks': playtime_mins_two_weeks}
+            for app_id, playtime_mins, playtime_mins_two_weeks in playtimes
+        ])
+        self.stats = self.library.stats
+
+    def test_totals(self):
+        self.assertEqual(self.stats.total_playtime_mins, 660)
+        self.assertEqual(self.stats.two_week_playtime_mins, 105)
+
+    def test_played_and_unplayed(self):
+
+        # Verify partitions keep library order at any threshold
+        played, unplayed = self.stats.played_and_unplayed(played_mins_threshold=30)
+        self.assertEqual([game.app_id for game in played], [10, 30])
+        self.assertEqual([game.app_id for game in unplayed], [20, 40])
+
+        self.assertEqual(self.stats.played_count(played_mins_threshold=1), 3)
+        self.assertEqual(self.stats.played_percent(played_mins_threshold=30), 50)
+
+    def test_playtime_percentile(self):
+        self.assertEqual(self.stats.playtime_percentile(50), 15)
+        self.assertEqual(self.stats.playtime_percentile(100), 600)
+
+    def test_stats_memoized(self):
+        self.assertIs(self.library.stats, self.stats)
+
+        # Verify stats are recomputed once the library changes
+        self.library.append({'appid': 50, 'name': '50', 'playtime_forever': 5})
+        self.assertEqual(self.library.stats.total_playtime_mins, 665)
+
+    def test_empty_library(self):
+        stats = GameLibrary().stats
+        self.assertEqual(stats.total_playtime_mins, 0)
+        self.assertEqual(stats.played_percent(), 0)
+        self.assertEqual(stats.playtime_percentile(50), 0)
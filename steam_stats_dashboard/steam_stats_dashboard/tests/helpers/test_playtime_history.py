@@ -0,0 +1,72 @@
+"""
+Unit tests for playtime_history module
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from steam_stats_dashboard.helpers.playtime_history import PlaytimeHistory, unpack_array
+from steam_stats_dashboard.models import PlaytimeSnapshot
+from steam_stats_dashboard.steam_api.fake_server import STEAM_ID_BASE
+from ..steam_api.fake_api_test_case import FakeSteamAPITestCase
+
+def games(playtimes):
+    return [{'appid': app_id, 'playtime_forever': mins} for app_id, mins in playtimes.items()]
+
+@override_settings(STEAM_SNAPSHOT_BASELINE_INTERVAL=3)
+class TestPlaytimeHistory(FakeSteamAPITestCase):
+    """ Unit test class for PlaytimeHistory """
+
+    fake_data_options = {'num_games': 20, 'num_friends': 0, 'private_ratio': 0}
+
+    steam_id = '76561197960265729'
+
+    def test_build_snapshot(self):
+        now = timezone.now()
+
+        # Verify first snapshot is a baseline of every app
+        snapshot = PlaytimeHistory.build_snapshot(self.steam_id, games({20: 0, 10: 60}), {}, None, now)
+        self.assertTrue(snapshot.is_baseline)
+        self.assertEqual(list(unpack_array(snapshot.app_ids)), [10, 20])
+        self.assertEqual(list(unpack_array(snapshot.playtimes)), [60, 0])
+        self.assertEqual(snapshot.total_delta, 0)
+
+        # Verify later snapshots only store apps played or added since, and nothing if none were.
+        # An added app's lifetime playtime isn't counted as played.
+        snapshot = PlaytimeHistory.build_snapshot(self.steam_id, games({10: 90, 20: 0, 30: 5}), {10: 60, 20: 0}, 0, now)
+        self.assertFalse(snapshot.is_baseline)
+        self.assertEqual(list(unpack_array(snapshot.app_ids)), [10, 30])
+        self.assertEqual(list(unpack_array(snapshot.playtimes)), [30, 5])
+        self.assertEqual(snapshot.total_delta, 30)
+        self.assertIsNone(PlaytimeHistory.build_snapshot(self.steam_id, games({10: 60}), {10: 60}, 0, now))
+
+    def test_take_snapshots(self):
+        for playtimes in ({10: 60, 20: 0}, {10: 90, 20: 0}, {10: 90, 20: 0}, {10: 90, 20: 15}, {10: 100, 20: 15}):
+            PlaytimeHistory.take_snapshots([(self.steam_id, games(playtimes))])
+
+        # Verify unchanged snapshot isn't stored, and a new baseline is stored after the interval
+        self.assertEqual(list(PlaytimeSnapshot.objects.order_by('taken_at').values_list('is_baseline', flat=True)),
+                         [True, False, False, True])
+        self.assertEqual(PlaytimeHistory.latest_playtimes(self.steam_id), ({10: 100, 20: 15}, 0))
+
+        # Verify range totals exclude the first baseline's lifetime playtime
+        self.assertEqual(PlaytimeHistory.playtime_mins_last_days(self.steam_id, 30), 55)
+        self.assertEqual(PlaytimeHistory.playtime_mins(self.steam_id, timezone.now() + timedelta(days=1)), 0)
+
+    def test_snapshot_private_then_public(self):
+        steam_id = str(STEAM_ID_BASE + 5)
+
+        # Verify a private library's empty reply isn't stored as a baseline
+        self.data.private_ratio = 1
+        call_command('snapshot_playtime', steam_ids=[steam_id], stdout=StringIO())
+        self.assertFalse(PlaytimeSnapshot.objects.filter(steam_id=steam_id).exists())
+
+        # Verify lifetime playtime isn't counted as played once the library is public
+        self.data.private_ratio = 0
+        call_command('snapshot_playtime', steam_ids=[steam_id], stdout=StringIO())
+        call_command('snapshot_playtime', steam_ids=[steam_id], stdout=StringIO())
+        self.assertEqual(PlaytimeSnapshot.objects.filter(steam_id=steam_id).count(), 1)
+        self.assertEqual(PlaytimeHistory.playtime_mins_last_days(steam_id, 30), 0)
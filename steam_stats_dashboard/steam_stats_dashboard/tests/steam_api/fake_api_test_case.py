@@ -0,0 +1,38 @@
+"""
+Base test case for tests run against a local fake Steam API
+"""
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from steam_stats_dashboard.steam_api.fake_server import FakeSteamAPIServer, FakeSteamData
+from steam_stats_dashboard.steam_api.steam_api import SteamAPI
+
+# Needs a working cache, unlike the project's default DummyCache, that fits a library's catalog entries
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'OPTIONS': {'MAX_ENTRIES': 100000}}})
+class FakeSteamAPITestCase(TestCase):
+    ''' Serves FakeSteamData built from fake_data_options on a local FakeSteamAPIServer
+        (cls.data, cls.server) for the test class, with SteamAPI requests sent to it.
+        The cache is cleared before each test.
+    '''
+
+    fake_data_options = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.data = FakeSteamData(**cls.fake_data_options)
+        cls.server = FakeSteamAPIServer(port=0, data=cls.data)
+        cls.server.start()
+        cls.base_url = SteamAPI.BASE_URL
+        SteamAPI.BASE_URL = cls.server.base_url
+
+    @classmethod
+    def tearDownClass(cls):
+        cache.clear()
+        SteamAPI.BASE_URL = cls.base_url
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
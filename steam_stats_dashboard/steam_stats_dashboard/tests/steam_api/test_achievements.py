@@ -0,0 +1,65 @@
+"""
+Unit tests for achievements module, run against a local fake Steam API
+"""
+from django.conf import settings
+from django.test import override_settings
+
+from steam_stats_dashboard.helpers.cache_helper import CacheKey, build_versioned_key
+from steam_stats_dashboard.steam_api.achievements import AchievementPipeline
+from steam_stats_dashboard.steam_api.background_refresh import BackgroundRefresh
+from steam_stats_dashboard.steam_api.fake_server import STEAM_ID_BASE
+from steam_stats_dashboard.steam_api.profile_cache import ProfileCache
+from steam_stats_dashboard.steam_api.steam_user_profile import SteamUserProfile
+from .fake_api_test_case import FakeSteamAPITestCase
+
+# API key budget that doesn't stop runs early
+@override_settings(STEAM_API_RATE_LIMITS={'default': (1000000, 1000000)})
+class TestAchievementPipeline(FakeSteamAPITestCase):
+    """ Unit test class for AchievementPipeline """
+
+    fake_data_options = {'num_games': 40, 'num_friends': 0, 'private_ratio': 0}
+
+    def setUp(self):
+        super().setUp()
+        self.steam_id = str(STEAM_ID_BASE + 2)
+        self.library = SteamUserProfile(self.steam_id).games_owned
+
+    def test_run(self):
+        played = [game for game in self.data.owned_games(self.steam_id, include_appinfo=False)
+                  if game['playtime_forever']]
+
+        # Verify progress is loaded in parts, and saved as it goes
+        progress = AchievementPipeline.run(self.steam_id, self.library, max_games=5)
+        self.assertEqual(len(progress), 5)
+        self.assertEqual(len(AchievementPipeline.pending(self.library, progress)), len(played) - 5)
+
+        progress = AchievementPipeline.run(self.steam_id, self.library)
+        self.assertEqual(ProfileCache.get_achievement_progress(self.steam_id), progress)
+        self.assertEqual(sum(row[1] for row in progress.values()),
+                         sum(len(self.data.unlocked_achievements(self.steam_id, game['appid'], game['playtime_forever']))
+                             for game in played))
+
+        # Verify nothing is requested once progress is up to date
+        request_count = self.server.request_count
+        AchievementPipeline.run(self.steam_id, self.library)
+        self.assertEqual(self.server.request_count, request_count)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_schedule_without_stored_progress(self):
+        # Verify no run is started when progress can't be kept
+        request_count = self.server.request_count
+        self.assertGreater(AchievementPipeline.schedule(self.steam_id, self.library), 0)
+        self.assertIsNone(AchievementPipeline._executor)
+        self.assertEqual(self.server.request_count, request_count)
+
+    @override_settings(STEAM_API_BATCH_QUOTA_RESERVE=1)
+    def test_batch_quota_spent(self):
+        # Verify runs aren't scheduled, and stop early, once the batch quota is spent
+        lock_key = build_versioned_key(CacheKey.USER, self.steam_id, 'achievement_pipeline')
+        self.assertGreater(AchievementPipeline.schedule(self.steam_id, self.library), 0)
+        self.assertEqual(BackgroundRefresh.acquire([lock_key]), [lock_key])
+        BackgroundRefresh.release([lock_key])
+
+        progress = AchievementPipeline.run(self.steam_id, self.library)
+        self.assertLess(len(progress), settings.STEAM_ACHIEVEMENT_WORKERS + 1)
+        self.assertTrue(AchievementPipeline.pending(self.library, progress))
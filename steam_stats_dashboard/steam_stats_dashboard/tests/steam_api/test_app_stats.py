@@ -0,0 +1,35 @@
+"""
+Unit tests for app stats module, run against a local fake Steam API
+"""
+from django.test import override_settings
+
+from steam_stats_dashboard.steam_api.app_stats import AppStats
+from steam_stats_dashboard.steam_api.fake_server import STEAM_ID_BASE
+from steam_stats_dashboard.steam_api.steam_user_profile import SteamUserProfile
+from .fake_api_test_case import FakeSteamAPITestCase
+
+class TestAppStats(FakeSteamAPITestCase):
+    """ Unit test class for AppStats """
+
+    fake_data_options = {'num_games': 20, 'num_friends': 0, 'private_ratio': 0}
+
+    def test_most_owned(self):
+        steam_ids = [str(STEAM_ID_BASE + 3), str(STEAM_ID_BASE + 4)]
+        self.assertEqual(AppStats.most_owned(steam_ids, limit=10), [])
+
+        owned = [set(game.app_id for game in SteamUserProfile(steam_id).games_owned) for steam_id in steam_ids]
+        most_owned = AppStats.most_owned(steam_ids, limit=1000)
+
+        self.assertEqual(set(most_owned), owned[0] | owned[1])
+        self.assertEqual(set(most_owned[:len(owned[0] & owned[1])]), owned[0] & owned[1])
+
+    @override_settings(STEAM_APP_GLOBAL_STATS={440: ['stat_a', 'stat_b']})
+    def test_refresh(self):
+        app_id = 440
+        self.assertEqual(AppStats.get_many([app_id]), {})
+        AppStats.refresh(app_id)
+
+        stats = AppStats.get_many([app_id, 570])
+        self.assertEqual(list(stats), [app_id])
+        self.assertIsInstance(stats[app_id]['current_players'], int)
+        self.assertEqual([name for name, total in stats[app_id]['global_stats']], ['stat_a', 'stat_b'])
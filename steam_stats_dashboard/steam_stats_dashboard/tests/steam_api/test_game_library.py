@@ -0,0 +1,40 @@
+"""
+Unit tests for game_library module
+"""
+from django.test import TestCase
+
+from steam_stats_dashboard.steam_api.game_library import GameLibrary
+
+class TestGameLibrary(TestCase):
+    """ Unit test class for GameLibrary """
+
+    def setUp(self):
+        self.games_owned = [
+            {'appid': 10, 'name': 'Counter-Strike', 'img_icon_url': 'icon10', 'img_logo_url': 'logo10',
+             'playtime_forever': 1200, 'playtime_2weeks': 30},
+            {'appid': 220, 'name': 'Half-Life 2', 'img_icon_url': 'icon220', 'img_logo_url': 'logo220',
+             'playtime_forever': 0, 'playtime_2weeks': None},
+        ]
+        self.library = GameLibrary(self.games_owned)
+
+    def test_game_views(self):
+        self.assertEqual(len(self.library), 2)
+
+        # Verify views expose the same attributes as Game
+        game = self.library[0]
+        self.assertEqual(game.app_id, 10)
+        self.assertEqual(game.name, 'Counter-Strike')
+        self.assertEqual(game.playtime_mins, 1200)
+        self.assertEqual(game.playtime_mins_two_weeks, 30)
+        self.assertEqual(game.time_played_total_hours, 20.0)
+        self.assertTrue(game.icon_img.endswith('/10/icon10.jpg'))
+
+        # Verify missing two week playtime is stored as 0
+        self.assertEqual(self.library[-1].playtime_mins_two_weeks, 0)
+
+    def test_iterate_and_slice(self):
+        self.assertEqual([game.app_id for game in self.library], [10, 220])
+        self.assertEqual([game.app_id for game in self.library[1:]], [220])
+
+        with self.assertRaises(IndexError):
+            self.library[2]
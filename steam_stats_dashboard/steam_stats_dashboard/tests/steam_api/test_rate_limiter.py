@@ -0,0 +1,28 @@
+"""
+Unit tests for rate_limiter module
+"""
+from django.test import TestCase
+
+from steam_stats_dashboard.steam_api.rate_limiter import TokenBucket
+
+class TestTokenBucket(TestCase):
+    """ Unit test class for TokenBucket """
+
+    def test_acquire_within_capacity(self):
+        bucket = TokenBucket(rate=1, capacity=3)
+
+        # Verify burst up to capacity is allowed, then refused without waiting
+        self.assertTrue(all(bucket.acquire() for _ in range(3)))
+        self.assertFalse(bucket.acquire())
+
+    def test_acquire_waits_for_refill(self):
+        bucket = TokenBucket(rate=100, capacity=1)
+        bucket.acquire()
+
+        # Verify caller waits for a token refilled within max_wait
+        self.assertTrue(bucket.acquire(max_wait=0.5))
+
+        # Verify caller is refused when refill takes longer than max_wait
+        slow_bucket = TokenBucket(rate=0.1, capacity=1)
+        slow_bucket.acquire()
+        self.assertFalse(slow_bucket.acquire(max_wait=0.1))
@@ -0,0 +1,73 @@
+"""
+Unit tests for single_flight module
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from steam_stats_dashboard.steam_api.single_flight import SingleFlight
+
+@override_settings(STEAM_API_SINGLE_FLIGHT_CROSS_PROCESS=False)
+class TestSingleFlight(TestCase):
+    """ Unit test class for SingleFlight """
+
+    def test_build_call_key(self):
+
+        # Verify param order doesn't change the key
+        key_1 = SingleFlight.build_call_key('ISteamUser', 'GetFriendList', {'a': 1, 'b': 2})
+        key_2 = SingleFlight.build_call_key('ISteamUser', 'GetFriendList', {'b': 2, 'a': 1})
+        self.assertEqual(key_1, key_2)
+
+    def test_concurrent_calls_coalesced(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def slow_call():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'response'
+
+        def caller():
+            results.append(SingleFlight.do(('test_key',), slow_call))
+
+        threads = [threading.Thread(target=caller) for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.1) # let the other callers reach the in-flight call
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        # Verify every caller got the result of a single underlying call
+        self.assertEqual(results, ['response'] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_error_raised_for_caller(self):
+
+        def failing_call():
+            raise ValueError('upstream error')
+
+        with self.assertRaises(ValueError):
+            SingleFlight.do(('failing_key',), failing_call)
+
+        # Verify the failed call isn't left in flight
+        self.assertEqual(SingleFlight.do(('failing_key',), lambda: 'ok'), 'ok')
+
+    @override_settings(STEAM_API_SINGLE_FLIGHT_CROSS_PROCESS=True,
+                       CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_shared_result_encoded(self):
+        cache.clear()
+        self.assertEqual(SingleFlight.do(('shared_key',), lambda: ['response'], encode=tuple, decode=list),
+                         ['response'])
+
+        # Verify a caller in another process, finding the lock held, gets the published result rebuilt
+        cache.set(SingleFlight._shared_keys(('shared_key',))[0], True)
+        self.assertEqual(SingleFlight.do(('shared_key',), lambda: self.fail("call not shared"),
+                                         encode=tuple, decode=list), ['response'])
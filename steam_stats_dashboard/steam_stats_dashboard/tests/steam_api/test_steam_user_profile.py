@@ -1,16 +1,129 @@
-# """
-# Unit tests for steam_user_profile module
-# """
-# from django.test import TestCase
+"""
+Unit tests for steam_user_profile module, run against a local fake Steam API
+"""
+import time
 
-# from steam_stats_profile.steam_api import SteamUserProfile
+from django.core.cache import cache
 
-# class TestSteamUserProfile(TestCase):
-#     """ Unit test class for SteamUserProfile """
+from steam_stats_dashboard.steam_api.fake_server import STEAM_ID_BASE
+from steam_stats_dashboard.steam_api.game_catalog import GameCatalog
+from steam_stats_dashboard.steam_api.profile_cache import ProfileCache
+from steam_stats_dashboard.steam_api.steam_api import SteamAPIInvalidUserError
+from steam_stats_dashboard.steam_api.steam_user_profile import SteamUserProfile
+from .fake_api_test_case import FakeSteamAPITestCase
 
-#     def setUp(self):
-#         self.test_user = SteamUserProfile()
+class TestSteamUserProfile(FakeSteamAPITestCase):
+    """ Unit test class for SteamUserProfile """
 
-#     def test_get_profile_json(self):
-#         print('running this test, yo')
-#         pass
+    fake_data_options = {'num_games': 250, 'num_friends': 150, 'private_ratio': 0}
+
+    def setUp(self):
+        super().setUp()
+        self.steam_id = str(STEAM_ID_BASE + 1)
+
+    def test_load_player_data(self):
+        profile = SteamUserProfile(self.steam_id)
+
+        self.assertTrue(profile.public)
+        self.assertEqual(profile.profile_dict['persona_name'], 'player_1')
+        self.assertEqual(len(profile.games_owned), 250)
+        self.assertEqual(profile.games_owned.stats.total_playtime_mins,
+                         sum(game['playtime_forever'] for game in self.data.owned_games(self.steam_id)))
+        self.assertIn('games_owned', profile.load_timings)
+
+    def test_games_owned_app_info(self):
+        profile = SteamUserProfile(self.steam_id)
+        game = profile.games_owned[0]
+
+        # Verify app info is joined from the shared game catalog
+        self.assertEqual(game.name, self.data.app(game.app_id)['name'])
+
+        # Verify app info is filled back in once catalog entries are gone
+        cache.delete(GameCatalog._key(game.app_id))
+        GameCatalog.clear_local()
+        self.assertEqual(SteamUserProfile(self.steam_id).games_owned[0].name, game.name)
+
+    def test_games_owned_single_request(self):
+        GameCatalog.clear_local()
+        request_count = self.server.request_count
+
+        # Verify a library not cached yet is fetched along with app info, in one GetOwnedGames call
+        profile = SteamUserProfile(self.steam_id)
+        self.assertEqual(self.server.request_count, request_count + 2) # player summary and games owned
+        self.assertEqual(profile.games_owned[0].name, self.data.app(profile.games_owned[0].app_id)['name'])
+
+    def test_recently_played(self):
+        profile = SteamUserProfile(self.steam_id, load_games=False)
+        recent_games = [game for game in self.data.owned_games(self.steam_id) if game.get('playtime_2weeks')]
+
+        # Verify recent activity doesn't load games owned
+        self.assertEqual(profile.recently_played.stats.two_week_playtime_mins,
+                         sum(game['playtime_2weeks'] for game in recent_games))
+        self.assertIsNone(profile._games_owned)
+        self.assertEqual(len(profile.games_owned), 250)
+
+    def test_friend_list(self):
+        profile = SteamUserProfile(self.steam_id)
+        friend_ids = self.data.friend_ids(self.steam_id)
+
+        # Verify friends past the first 100 ids are loaded
+        self.assertEqual(len(profile.friend_list), 150)
+        friend = profile.friend_list[120]
+        self.assertFalse(friend.is_loaded)
+        self.assertEqual(friend.profile_dict['steam_id'], friend_ids[120])
+        self.assertTrue(friend.is_loaded)
+
+    def test_profile_cache_refresh(self):
+        # Verify missing data is refetched, and fresh data isn't
+        self.assertEqual(len(ProfileCache.refresh(self.steam_id)), 4)
+        self.assertEqual(ProfileCache.keys_to_refresh(self.steam_id), [])
+        self.assertEqual(len(ProfileCache.keys_to_refresh(self.steam_id, within=86400)), 4)
+
+    def test_refresh_stale(self):
+        SteamUserProfile(self.steam_id).recently_played
+        value_names = (ProfileCache.GAMES_OWNED, ProfileCache.RECENTLY_PLAYED)
+        recently_played_key = ProfileCache._key(self.steam_id, ProfileCache.RECENTLY_PLAYED)
+        entry = cache.get(recently_played_key)
+        cache.set(recently_played_key, (entry[0] - ProfileCache._ttls(ProfileCache.RECENTLY_PLAYED)[0] - 1,) + entry[1:])
+
+        # Verify only the stale value is refetched, in the background
+        self.assertIsNone(ProfileCache.data_version(self.steam_id, value_names, fresh_only=True))
+        self.assertEqual(ProfileCache.refresh_stale(self.steam_id, value_names), [recently_played_key])
+        for _ in range(50):
+            if ProfileCache.data_version(self.steam_id, value_names, fresh_only=True):
+                break
+            time.sleep(0.1)
+        self.assertIsNotNone(ProfileCache.data_version(self.steam_id, value_names, fresh_only=True))
+        self.assertEqual(ProfileCache.refresh_stale(self.steam_id, value_names), [])
+
+    def test_fetch_games_owned(self):
+        SteamUserProfile(self.steam_id)
+        request_count = self.server.request_count
+
+        # Verify games owned are requested even when cached, and stored for later reads
+        games_owned = ProfileCache.fetch_games_owned(self.steam_id)
+        self.assertEqual(self.server.request_count, request_count + 1)
+        self.assertEqual([game['appid'] for game in games_owned],
+                         [game.app_id for game in SteamUserProfile(self.steam_id).games_owned])
+
+    def test_missing_player_summary(self):
+        # Verify a steam id Steam returns no summary for isn't loaded as an empty profile
+        with self.assertRaises(SteamAPIInvalidUserError):
+            SteamUserProfile('not-an-id')
+
+    def test_validate_steam_id(self):
+        self.assertEqual(SteamUserProfile.validate_steam_id(self.steam_id), self.steam_id)
+
+        with self.assertRaises(SteamAPIInvalidUserError):
+            SteamUserProfile.validate_steam_id('not-an-id')
+
+    def test_get_steam_id_from_vanity_url_name(self):
+        self.assertEqual(SteamUserProfile.get_steam_id_from_vanity_url_name('player_1'), self.steam_id)
+        self.assertIsNone(SteamUserProfile.get_steam_id_from_vanity_url_name('no_such_player'))
+
+        # Verify no match is cached, resolved ids are recorded as valid, and impossible names aren't requested
+        request_count = self.server.request_count
+        self.assertIsNone(SteamUserProfile.get_steam_id_from_vanity_url_name('no_such_player'))
+        self.assertEqual(SteamUserProfile.validate_steam_id(self.steam_id), self.steam_id)
+        self.assertIsNone(SteamUserProfile.get_steam_id_from_vanity_url_name('not a name?'))
+        self.assertEqual(self.server.request_count, request_count)
@@ -11,8 +11,14 @@ urlpatterns = [
     url(r'^dashboard/profile', views.dashboard_profile, name='dashboard'),
     url(r'^accounts/logout/$', logout, {'next_page': '/'}), # override django-allath logout
     url(r'^accounts/', include('allauth.urls')),
+    url(r'^metrics$', views.metrics, name='metrics'),
 
     # manual player lookup urls
     url(r'^get-steam-id-public/$', views.get_steam_id_public, name='get_steam_id_public'),
     url(r'^player/(?P<steam_id>[0-9]{17})$', views.player_stats, name='player_stats'),
+
+    # player JSON API urls
+    url(r'^api/player/(?P<steam_id>[0-9]{17})/library$', views.api_library, name='api_library'),
+    url(r'^api/player/(?P<steam_id>[0-9]{17})/stats$', views.api_stats, name='api_stats'),
+    url(r'^api/player/(?P<steam_id>[0-9]{17})/friends$', views.api_friends, name='api_friends'),
 ]
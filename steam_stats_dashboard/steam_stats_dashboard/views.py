@@ -1,54 +1,162 @@
 """
 Steam Stats Dashoard views module
 """
+from datetime import datetime
 import re
+import time
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import (Http404, HttpResponse, HttpResponseForbidden, HttpResponseRedirect, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import render, redirect
 from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
+from .steam_api.profile_cache import ProfileCache
+from .steam_api.rate_limiter import RateLimiter
+from .steam_api.steam_api import SteamAPIConnectionError, SteamAPIInvalidUserError, SteamAPIRateLimited
 from .steam_api.steam_user_profile import SteamUserProfile
-from .helpers.panel_data import PanelDataTimePlayed, PanelDataCollection
+from .helpers import json_api
+from .helpers.fragment_cache import render_panel
+from .helpers.instrumentation import Instrumentation
+from .helpers.panel_data import PanelDataTimePlayed, PanelDataCollection, PanelDataAchievements
 
 def home(request):
     ''' View for site home '''
     return render(request, 'home.html')
 
+def _dashboard_data_version(request):
+    ''' Return (version, last_modified) of the logged in user's cached Steam data, or None
+        if any of it isn't cached or is due a refresh, so the view runs and refreshes it.
+        Records the user as seen, since a 304 response skips the view.
+    '''
+    if not request.user.is_authenticated or not request.user.steam_id:
+        return None
+
+    if not hasattr(request, '_dashboard_data_version'):
+        request.user.mark_seen()
+        request._dashboard_data_version = ProfileCache.data_version(
+            request.user.steam_id,
+            (ProfileCache.PROFILE, ProfileCache.GAMES_OWNED, ProfileCache.RECENTLY_PLAYED,
+             ProfileCache.ACHIEVEMENT_PROGRESS),
+            fresh_only=True)
+
+    return request._dashboard_data_version
+
+def _dashboard_period():
+    ''' Return start time of the current DASHBOARD_FRAGMENT_TIMEOUT period. Panels also show
+        time based averages and global app stats that change without the user's data changing,
+        so responses are revalidated at least once a period.
+    '''
+    return time.time() // settings.DASHBOARD_FRAGMENT_TIMEOUT * settings.DASHBOARD_FRAGMENT_TIMEOUT
+
+def _panel_data_version(steam_id, *value_names):
+    ''' Return version of the cached profile and value_names a panel is rendered from or None '''
+    data_version = ProfileCache.data_version(steam_id, (ProfileCache.PROFILE,) + value_names)
+    return data_version[0] if data_version else None
+
+def _dashboard_etag(request):
+    data_version = _dashboard_data_version(request)
+    return "{}-{:.0f}".format(data_version[0], _dashboard_period()) if data_version else None
+
+def _dashboard_last_modified(request):
+    data_version = _dashboard_data_version(request)
+    if not data_version:
+        return None
+    return datetime.fromtimestamp(max(data_version[1], _dashboard_period()), timezone.utc)
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_dashboard_etag, last_modified_func=_dashboard_last_modified)
 def dashboard_profile(request):
     ''' Dashboard profile stats view
         SteamUser's profile data accessible in template through request.user.profile.
-        Other panel data in context.
+        Rendered panel html in context['panels'], cached until the Steam data each panel is
+        rendered from changes. Games owned are only loaded if a panel needs rendering.
+        Browsers revalidate with ETag/Last-Modified and get a 304 if the data hasn't changed
+        and is still fresh.
     '''
-    request.user.load_profile()
+    try:
+        request.user.load_profile(load_games=False)
+    except (SteamAPIRateLimited, SteamAPIConnectionError, SteamAPIInvalidUserError):
+        # Profile isn't cached and can't be requested (or Steam returned no summary),
+        # panels fall back on their own otherwise
+        response = render(request, 'steam-unavailable.html', status=503)
+        response['Retry-After'] = RateLimiter.retry_after()
+        return response
 
     if not request.user.profile.public:
         # User's profile is private, no data to display
         return render(request, 'private-profile.html')
 
+    steam_id = request.user.steam_id
+    # Cached panels aren't re-rendered until their data changes, so the stale data they're
+    # rendered from isn't read (and refreshed) through the cache
+    ProfileCache.refresh_stale(steam_id, (ProfileCache.GAMES_OWNED, ProfileCache.RECENTLY_PLAYED))
+    library_version = _panel_data_version(steam_id, ProfileCache.GAMES_OWNED)
+    recent_version = _panel_data_version(steam_id, ProfileCache.RECENTLY_PLAYED)
+    # Re-rendered as achievements load, which also picks up games played since
+    achievements_version = _panel_data_version(steam_id, ProfileCache.GAMES_OWNED, ProfileCache.ACHIEVEMENT_PROGRESS)
+
     # get dashboard panel data
     panel_data_time_played = PanelDataTimePlayed(request.user.profile)
     panel_data_collection = PanelDataCollection(request.user.profile)
+    panel_data_achievements = PanelDataAchievements(request.user.profile)
 
-    context = {}
+    def time_played_context():
+        return {
+            'time_played': {
+                'lifetime_hours': panel_data_time_played.time_played_hours_total(),
+                'lifetime_time_dict': panel_data_time_played.time_played_dict_total(),
+                'lifetime_daily_avg': panel_data_time_played.avg_daily_hours_total(),
+                'lifetime_daily_avg_dict': panel_data_time_played.avg_daily_time_dict_total(),
+            }
+        }
 
-    context['time_played'] = {
-        'lifetime_hours': panel_data_time_played.time_played_hours_total(),
-        'lifetime_time_dict': panel_data_time_played.time_played_dict_total(),
-        'lifetime_daily_avg': panel_data_time_played.avg_daily_hours_total(),
-        'lifetime_daily_avg_dict': panel_data_time_played.avg_daily_time_dict_total(),
-    }
+    def recent_activity_context():
+        return {
+            'recent_activity': {
+                'two_weeks_time_dict': panel_data_time_played.time_played_two_weeks_dict(),
+                'two_weeks_daily_avg_dict': panel_data_time_played.avg_daily_time_dict_two_weeks(),
+                'top_played_games': panel_data_collection.top_played_games_two_weeks(num_games=3),
+            }
+        }
+
+    def achievements_context():
+        return {
+            'achievements': {
+                'completion': panel_data_achievements.completion(),
+                'games_pending': panel_data_achievements.games_pending(),
+            }
+        }
+
+    def collection_context():
+        # Rename to library
+        games_played, games_unplayed = panel_data_collection.played_and_unplayed_lists(played_mins_threshold=30)
+        games_played_percent = panel_data_collection.played_percent(played_mins_threshold=30)
 
-    # Rename to library
-    games_played, games_unplayed = panel_data_collection.played_and_unplayed_lists(played_mins_threshold=30)
-    games_played_percent = round(len(games_played) / len(request.user.profile.games_owned) * 100)
+        return {
+            'collection': {
+                'top_played_games': panel_data_collection.with_current_players(
+                    panel_data_collection.top_played_games(num_games=3)),
+                'games_played': games_played,
+                'games_unplayed': games_unplayed,
+                'games_played_percent': games_played_percent,
+            }
+        }
 
-    context['collection'] = {
-        'top_played_games': panel_data_collection.top_played_games(num_games=3),
-        'games_played': games_played,
-        'games_unplayed': games_unplayed,
-        'games_played_percent': games_played_percent,
+    context = {}
+
+    context['panels'] = {
+        'time_played': render_panel(request, steam_id, 'time-played', library_version, time_played_context),
+        'recent_activity': render_panel(request, steam_id, 'recent-activity', recent_version,
+                                        recent_activity_context),
+        'collection': render_panel(request, steam_id, 'collection', library_version, collection_context),
+        'achievements': render_panel(request, steam_id, 'achievements', achievements_version,
+                                     achievements_context),
     }
 
     return render(request, 'profile-stats.html', context)
@@ -60,8 +168,12 @@ def get_steam_id_public(request):
 
     # Check for user-provided steam id first
     if re.fullmatch("^[0-9]{17}$", input_steam_uid):
-        # Use 64 bit Steam ID returned from API
-        steam_id = SteamUserProfile(input_steam_uid).validate_user_input_steam_id()
+        # Use 64 bit Steam ID returned from API. Only the player summary is requested,
+        # and it's cached for the player_stats redirect.
+        try:
+            steam_id = SteamUserProfile.validate_steam_id(input_steam_uid)
+        except SteamAPIInvalidUserError:
+            steam_id = None
     else:
         # Try getting steam id from vanity url name
         steam_id = SteamUserProfile.get_steam_id_from_vanity_url_name(input_steam_uid)
@@ -73,5 +185,117 @@ def get_steam_id_public(request):
 
 def player_stats(request, steam_id):
     ''' Get and display stats for requested player '''
-    player = SteamUserProfile(steam_id)
+    # Validate from the cached player summary rather than loading the full profile,
+    # until the stats page needs the player's games and friends
+    try:
+        SteamUserProfile.validate_steam_id(steam_id)
+    except SteamAPIInvalidUserError:
+        raise Http404('Steam player not found')
+
     return HttpResponse('valid player - stats page - not yet implemented')
+
+def metrics(request):
+    ''' Process-wide Steam API, cache, and request timing metrics in Prometheus text format '''
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+
+    rate_limit_stats = RateLimiter.stats()
+    gauges = {
+        'steam_api_daily_quota': rate_limit_stats['daily_quota'],
+        'steam_api_daily_calls': rate_limit_stats['daily_calls'],
+        'steam_api_daily_remaining': rate_limit_stats['daily_remaining'],
+        'steam_api_calls_throttled': rate_limit_stats['calls_throttled'],
+    }
+
+    return HttpResponse(Instrumentation.render_prometheus(gauges), content_type='text/plain; version=0.0.4')
+
+########## Player JSON API (see helpers/json_api.py) ##########
+
+def _api_view(view_func):
+    ''' Decorator returning APIRequestErrors raised by an API view as JSON error responses,
+        and Steam being rate limited or unreachable as 503 responses with Retry-After
+    '''
+    def wrapped(request, *args, **kwargs):
+        try:
+            return view_func(request, *args, **kwargs)
+        except json_api.APIRequestError as error:
+            return JsonResponse({'error': str(error)}, status=error.status)
+        except (SteamAPIRateLimited, SteamAPIConnectionError):
+            response = JsonResponse({'error': 'Steam is unavailable, try again later'}, status=503)
+            response['Retry-After'] = RateLimiter.retry_after()
+            return response
+
+    return wrapped
+
+def _api_profile(steam_id):
+    ''' Return SteamUserProfile for steam_id, without games owned loaded
+        @raises APIRequestError if steam_id isn't a player (404) or the profile is private (403)
+    '''
+    try:
+        SteamUserProfile.validate_steam_id(steam_id)
+        profile = SteamUserProfile(steam_id, load_games=False)
+    except SteamAPIInvalidUserError:
+        raise json_api.APIRequestError('Steam player not found', 404)
+
+    if not profile.public:
+        raise json_api.APIRequestError('Steam profile is private', 403)
+
+    return profile
+
+def _api_data_version(steam_id, value_name):
+    ''' Return version of a cached value for steam_id, that cursors are issued for '''
+    data_version = ProfileCache.data_version(steam_id, (value_name,))
+    return data_version[0] if data_version else None
+
+def _api_records_response(request, records_func, total, data_version, key):
+    ''' Return a page of records as JSON, or every record from the cursor on as NDJSON
+        (format=ndjson)
+        @param records_func: callable(start, stop) returning an iterable of records
+    '''
+    offset = json_api.decode_cursor(request.GET.get('cursor'), data_version)
+    response_format = request.GET.get('format', 'json')
+
+    if response_format == 'ndjson':
+        return StreamingHttpResponse(json_api.ndjson_stream(records_func(offset, None)),
+                                     content_type=json_api.NDJSON_CONTENT_TYPE)
+    if response_format != 'json':
+        raise json_api.APIRequestError('format must be json or ndjson')
+
+    limit = json_api.parse_limit(request.GET.get('limit'))
+    return JsonResponse(json_api.page(records_func(offset, offset + limit), total, offset, limit, data_version, key))
+
+@_api_view
+def api_library(request, steam_id):
+    ''' Player's games owned, in library order
+        Query params: cursor, limit, fields (see json_api.LIBRARY_FIELDS), format (json or ndjson)
+    '''
+    fields = json_api.parse_fields(request.GET.get('fields'), json_api.LIBRARY_FIELDS)
+    library = _api_profile(steam_id).games_owned
+    data_version = _api_data_version(steam_id, ProfileCache.GAMES_OWNED)
+
+    return _api_records_response(request, lambda start, stop: json_api.library_records(library, fields, start, stop),
+                                 len(library), data_version, 'games')
+
+@_api_view
+def api_stats(request, steam_id):
+    ''' Player's library stats
+        Query params: fields (see json_api.STATS_FIELDS)
+    '''
+    fields = json_api.parse_fields(request.GET.get('fields'), json_api.STATS_FIELDS)
+    profile = _api_profile(steam_id)
+
+    return JsonResponse(json_api.stats_record(profile.games_owned, profile.recently_played, fields))
+
+@_api_view
+def api_friends(request, steam_id):
+    ''' Player's friends, with profiles loaded a page at a time
+        Query params: cursor, limit, fields (see json_api.FRIEND_FIELDS), format (json or ndjson)
+    '''
+    fields = json_api.parse_fields(request.GET.get('fields'), json_api.FRIEND_FIELDS)
+    friend_list = _api_profile(steam_id).friend_list
+    num_friends = len(friend_list)
+    data_version = _api_data_version(steam_id, ProfileCache.FRIEND_IDS)
+
+    return _api_records_response(request,
+                                 lambda start, stop: json_api.friend_records(friend_list, fields, start, stop),
+                                 num_friends, data_version, 'friends')